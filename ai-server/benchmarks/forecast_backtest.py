@@ -0,0 +1,271 @@
+"""
+Rolling-origin backtest and tuning harness for the forecast engines.
+
+For every ticker, configuration and forecast origin it trains on the stored
+daily closes up to the origin, forecasts the next --horizon-days and scores
+the forecast against the closes that followed (MAPE and interval coverage,
+as in benchmarks.forecast_benchmark). Origins step back from the latest bar
+by --step-days, --folds times.
+
+Configurations are the product of the Prophet parameter grid, training
+frequencies and lookback windows, plus the fast drift engine as a baseline.
+Folds run in parallel across a process pool. Each fold's result is cached on
+disk under its model key (ticker, parameters and training window), so
+re-running with a wider grid or one more origin only fits what is new.
+
+History is read from the local bar store only (no network), for --tickers or
+every ticker held in the portfolio store.
+
+Usage (from the ai-server directory):
+    python -m benchmarks.forecast_backtest --folds 4 --horizon-days 180 \\
+        --changepoint-prior-scale 0.05 0.15 0.5 --seasonality-mode additive multiplicative
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+
+def config_label(config):
+    """Short human-readable name of a configuration."""
+    parts = [config["engine"], config["frequency"], f"lookback={config['lookbackYears'] or 'all'}"]
+    parts += [f"{name}={value}" for name, value in sorted(config.get("overrides", {}).items())]
+    return " ".join(parts)
+
+
+def build_configs(args, model_params):
+    """Expands the CLI grid into configuration dictionaries."""
+    grid = {
+        "seasonality_mode": args.seasonality_mode,
+        "changepoint_prior_scale": args.changepoint_prior_scale,
+        "seasonality_prior_scale": args.seasonality_prior_scale,
+        "holidays_prior_scale": args.holidays_prior_scale,
+    }
+    grid = {name: values for name, values in grid.items() if values}
+    configs = []
+    for frequency, lookback in itertools.product(args.frequencies, args.lookbacks):
+        for values in itertools.product(*grid.values()):
+            overrides = dict(zip(grid.keys(), values))
+            configs.append({
+                "engine": "prophet",
+                "frequency": frequency,
+                "lookbackYears": lookback or None,
+                "overrides": overrides,
+                "params": {**model_params, **overrides, "frequency": frequency},
+            })
+        if args.include_fast:
+            configs.append({
+                "engine": "fast",
+                "frequency": frequency,
+                "lookbackYears": lookback or None,
+                "params": {"engine": "fast", "frequency": frequency},
+            })
+    for config in configs:
+        config["label"] = config_label(config)
+    return configs
+
+
+def _cache_path(cache_dir, key, horizon_days):
+    return os.path.join(cache_dir, f"{key}__h{horizon_days}.json")
+
+
+def run_fold(task):
+    """
+    Fits one configuration on one training window and scores it. Runs inside a pool worker.
+
+    The result is written to the task's cache path before it is returned.
+    """
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    from benchmarks.forecast_benchmark import score
+    from predictive_analysis import fast_forecast, prophet_stock
+
+    config, train, holdout = task["config"], task["train"], task["holdout"]
+    frequency = config["frequency"]
+    freq, periods_per_year = prophet_stock.FREQUENCIES[frequency]
+    years = max(1, int(np.ceil(task["horizonDays"] / 365)))
+
+    started = time.perf_counter()
+    if config["engine"] == "fast":
+        forecast = fast_forecast.forecast_many({task["ticker"]: train}, years, freq, periods_per_year)[task["ticker"]]
+        if isinstance(forecast, Exception):
+            raise forecast
+        fit_seconds = time.perf_counter() - started
+    else:
+        model = prophet_stock.fit_model(train.copy(), **config["params"])
+        fit_seconds = time.perf_counter() - started
+        forecast = prophet_stock.forecast_model(model, years, frequency)
+
+    mape, coverage = score(forecast, holdout)
+    result = {
+        "ticker": task["ticker"],
+        "config": config["label"],
+        "cutoff": task["cutoff"],
+        "trainRows": len(train),
+        "fit_s": round(fit_seconds, 3),
+        "mape_pct": round(mape, 3),
+        "coverage": round(coverage, 3),
+    }
+    tmp_path = f"{task['cachePath']}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, task["cachePath"])
+    return result
+
+
+def build_tasks(histories, configs, folds, horizon_days, step_days, cache_dir):
+    """
+    Splits every (ticker, configuration, origin) into a fold task.
+
+    Returns:
+        (tasks to run, results already in the cache)
+    """
+    from predictive_analysis import model_store, prophet_stock
+
+    tasks, cached = [], []
+    for ticker, history in histories.items():
+        last = history["ds"].iloc[-1]
+        for fold in range(folds):
+            cutoff = last - pd.Timedelta(days=horizon_days + fold * step_days)
+            past = history[history["ds"] <= cutoff]
+            holdout = history[(history["ds"] > cutoff) & (history["ds"] <= cutoff + pd.Timedelta(days=horizon_days))]
+            if len(past) < 60 or holdout.empty:
+                continue
+            for config in configs:
+                train = prophet_stock.prepare_training_data(past, config["lookbackYears"], config["frequency"])
+                if len(train) < 3:
+                    continue
+                path = _cache_path(cache_dir, model_store.model_key(ticker, train, config["params"]), horizon_days)
+                if os.path.exists(path):
+                    with open(path, "r") as f:
+                        cached.append(json.load(f))
+                    continue
+                tasks.append({
+                    "ticker": ticker,
+                    "config": config,
+                    "cutoff": cutoff.strftime("%Y-%m-%d"),
+                    "horizonDays": horizon_days,
+                    "train": train,
+                    "holdout": holdout.reset_index(drop=True),
+                    "cachePath": path,
+                })
+    return tasks, cached
+
+
+def run_tasks(tasks, workers, start_method):
+    """Runs fold tasks across a process pool; failed folds are reported and skipped."""
+    results = []
+    if not tasks:
+        return results
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context(start_method)) as pool:
+        futures = {pool.submit(run_fold, task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            task = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(tasks)}] {task['ticker']} {task['config']['label']} @ {task['cutoff']} failed: {e}")
+                continue
+            results.append(result)
+            print(f"[{done}/{len(tasks)}] {result['ticker']} {result['config']} @ {result['cutoff']}: "
+                  f"MAPE {result['mape_pct']}% fit {result['fit_s']}s")
+    return results
+
+
+def summarize(results):
+    """Aggregates fold results per configuration, most accurate first."""
+    frame = pd.DataFrame(results)
+    report = frame.groupby("config", sort=False).agg(
+        folds=("cutoff", "size"),
+        tickers=("ticker", "nunique"),
+        mape_pct=("mape_pct", "mean"),
+        mape_p50=("mape_pct", "median"),
+        coverage=("coverage", "mean"),
+        fit_s=("fit_s", "mean"),
+        total_fit_s=("fit_s", "sum"),
+    ).reset_index().sort_values("mape_pct")
+    return report.round({"mape_pct": 3, "mape_p50": 3, "coverage": 3, "fit_s": 3, "total_fit_s": 2}).to_dict(orient="records")
+
+
+def load_histories(bar_store, tickers):
+    """Stored daily closes per ticker as 'ds'/'y' frames; tickers with no stored bars are skipped."""
+    histories = {}
+    for ticker in tickers:
+        bars = bar_store.read_bars(ticker, "1d")["Close"].dropna()
+        if bars.empty:
+            print(f"Skipping {ticker}: no stored daily bars")
+            continue
+        histories[ticker] = pd.DataFrame({"ds": bars.index, "y": bars.to_numpy(dtype=np.float64)})
+    return histories
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of forecast configurations on locally stored history")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to backtest (default: every ticker in the portfolio store)")
+    parser.add_argument("--folds", type=int, default=4, help="Forecast origins per ticker")
+    parser.add_argument("--horizon-days", type=int, default=180, help="Calendar days scored after each origin")
+    parser.add_argument("--step-days", type=int, default=90, help="Calendar days between successive origins")
+    parser.add_argument("--frequencies", nargs="+", default=["daily"], choices=["daily", "weekly", "monthly"])
+    parser.add_argument("--lookbacks", type=int, nargs="+", default=[0], help="Lookback windows in years (0 = all history)")
+    parser.add_argument("--seasonality-mode", nargs="+", choices=["additive", "multiplicative"])
+    parser.add_argument("--changepoint-prior-scale", type=float, nargs="+")
+    parser.add_argument("--seasonality-prior-scale", type=float, nargs="+")
+    parser.add_argument("--holidays-prior-scale", type=float, nargs="+")
+    parser.add_argument("--no-fast", dest="include_fast", action="store_false", help="Leave out the fast engine baseline")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel fold workers")
+    parser.add_argument("--bar-store", help="Bar store database to read (default: BAR_STORE_PATH)")
+    parser.add_argument("--cache-dir", default=os.getenv("BACKTEST_CACHE_DIR", "./database/backtests"), help="Fold result cache")
+    parser.add_argument("--output", help="Write the report and fold results as JSON to this path")
+    args = parser.parse_args()
+
+    # Configuration is read at import time, so set it before importing the services
+    if args.bar_store:
+        os.environ["BAR_STORE_PATH"] = args.bar_store
+    os.environ.setdefault("PROPHET_MODEL_DIR", os.path.join(tempfile.gettempdir(), "backtest-prophet-models"))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+    from predictive_analysis import prophet_stock
+    from services import bar_store, portfolio_store
+
+    tickers = args.tickers or list(dict.fromkeys(row[2] for row in portfolio_store.load_all_positions()[0]))
+    histories = load_histories(bar_store, tickers)
+    configs = build_configs(args, prophet_stock.MODEL_PARAMS)
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    tasks, cached = build_tasks(histories, configs, args.folds, args.horizon_days, args.step_days, args.cache_dir)
+    print(f"{len(configs)} configurations, {len(histories)} tickers: {len(tasks)} folds to fit, {len(cached)} cached")
+    started = time.perf_counter()
+    results = cached + run_tasks(tasks, args.workers, prophet_stock.PROPHET_START_METHOD)
+    wall = time.perf_counter() - started
+    if not results:
+        print("No folds to report")
+        return
+
+    report = summarize(results)
+    width = max(len(row["config"]) for row in report)
+    header = f"{'configuration':<{width}} {'folds':>5} {'MAPE %':>8} {'p50 %':>8} {'coverage':>8} {'fit s':>8} {'total s':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        print(
+            f"{row['config']:<{width}} {row['folds']:>5} {row['mape_pct']:>8} {row['mape_p50']:>8} "
+            f"{row['coverage']:>8} {row['fit_s']:>8} {row['total_fit_s']:>9}"
+        )
+    print(f"Wall time {wall:.1f}s with {args.workers} workers")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"report": report, "folds": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Offline benchmark for Prophet training settings.
+
+For every combination of lookback window and training frequency it fits a
+model on history up to a cutoff, forecasts the held-out tail and reports:
+  - fit_s:     wall time of the Prophet fit
+  - mape_pct:  mean absolute percentage error on the holdout's daily closes
+  - coverage:  share of holdout closes inside the forecast interval
+
+Weekly and monthly forecasts are interpolated onto the holdout's trading days,
+so every setting is scored against the same daily closes. History comes from
+the market data provider (replayed fixtures with --fixtures), or from
+deterministic synthetic bars when no fixtures are given.
+
+Usage (from the ai-server directory):
+    python -m benchmarks.forecast_benchmark --lookbacks 0 10 5 2 --frequencies daily weekly monthly
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stocks_benchmark import generate_fixtures, recorded_tickers
+
+
+def load_history(provider, ticker):
+    """Daily closes for `ticker` as a Prophet 'ds'/'y' frame, oldest first."""
+    bars = provider.history(ticker, period="max", interval="1d")
+    if bars.empty:
+        return pd.DataFrame(columns=["ds", "y"])
+    close = bars["Close"].dropna()
+    index = pd.DatetimeIndex(close.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return pd.DataFrame({"ds": index.normalize(), "y": close.to_numpy(dtype=np.float64)})
+
+
+def score(forecast, holdout):
+    """Interpolates a forecast onto the holdout dates; returns (MAPE %, interval coverage)."""
+    ds = forecast["ds"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    target = holdout["ds"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    actual = holdout["y"].to_numpy(dtype=np.float64)
+    yhat = np.interp(target, ds, forecast["yhat"].to_numpy())
+    lower = np.interp(target, ds, forecast["yhat_lower"].to_numpy())
+    upper = np.interp(target, ds, forecast["yhat_upper"].to_numpy())
+    mape = float(np.mean(np.abs(yhat - actual) / np.abs(actual)) * 100)
+    coverage = float(np.mean((actual >= lower) & (actual <= upper)))
+    return mape, coverage
+
+
+def run_setting(prophet_stock, history, holdout_days, lookback_years, frequency):
+    """Fits one setting on history before the cutoff and scores it on the holdout."""
+    cutoff = history["ds"].iloc[-1] - pd.Timedelta(days=holdout_days)
+    train = prophet_stock.prepare_training_data(history[history["ds"] <= cutoff], lookback_years, frequency)
+    holdout = history[history["ds"] > cutoff]
+    params = {**prophet_stock.MODEL_PARAMS, "frequency": frequency}
+
+    started = time.perf_counter()
+    model = prophet_stock.fit_model(train, **params)
+    fit_seconds = time.perf_counter() - started
+
+    years = max(1, int(np.ceil(holdout_days / 365)))
+    forecast = prophet_stock.forecast_model(model, years, frequency)
+    mape, coverage = score(forecast, holdout)
+    return {
+        "lookback_years": lookback_years or 0,
+        "frequency": frequency,
+        "train_rows": len(train),
+        "fit_s": round(fit_seconds, 3),
+        "mape_pct": round(mape, 3),
+        "coverage": round(coverage, 3),
+    }
+
+
+def summarize(rows):
+    """Averages per-ticker rows by (lookback, frequency); a lookback of 0 means all history."""
+    frame = pd.DataFrame(rows)
+    grouped = frame.groupby(["lookback_years", "frequency"], sort=False).agg(
+        tickers=("ticker", "nunique"),
+        train_rows=("train_rows", "mean"),
+        fit_s=("fit_s", "mean"),
+        mape_pct=("mape_pct", "mean"),
+        coverage=("coverage", "mean"),
+    ).reset_index()
+    grouped["train_rows"] = grouped["train_rows"].round().astype(int)
+    return grouped.round({"fit_s": 3, "mape_pct": 3, "coverage": 3}).to_dict(orient="records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Prophet fit time against forecast error per training setting")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to forecast (default: every recorded or synthetic ticker)")
+    parser.add_argument("--lookbacks", type=int, nargs="+", default=[0, 10, 5, 2], help="Lookback windows in years (0 = all history)")
+    parser.add_argument("--frequencies", nargs="+", default=["daily", "weekly", "monthly"], choices=["daily", "weekly", "monthly"])
+    parser.add_argument("--holdout-days", type=int, default=365, help="Calendar days held out at the end of each series")
+    parser.add_argument("--fixtures", help="Recorded fixtures directory (default: generate synthetic fixtures)")
+    parser.add_argument("--synthetic-tickers", type=int, default=3, help="Synthetic series to generate when no fixtures are given")
+    parser.add_argument("--synthetic-years", type=int, default=15, help="Years of synthetic history per series")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="forecast-bench-")
+    fixtures_dir = args.fixtures
+    if fixtures_dir is None:
+        fixtures_dir = os.path.join(workdir, "fixtures")
+        generate_fixtures(
+            fixtures_dir, [f"F{i}" for i in range(args.synthetic_tickers)],
+            days=args.synthetic_years * 252
+        )
+
+    # Configuration is read at import time, so set it before importing the services
+    os.environ.update({
+        "MARKET_DATA_PROVIDER": "replay",
+        "REPLAY_FIXTURES_DIR": fixtures_dir,
+        "BAR_STORE_PATH": os.path.join(workdir, "market_bars.db"),
+        "PORTFOLIO_DB_PATH": os.path.join(workdir, "portfolio.db"),
+        "PROPHET_MODEL_DIR": os.path.join(workdir, "prophet_models"),
+        "CACHE_BACKEND": "memory",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+    from predictive_analysis import prophet_stock
+    from services.market_data_provider import get_provider
+
+    provider = get_provider()
+    tickers = args.tickers or recorded_tickers(fixtures_dir)
+    rows = []
+    for ticker in tickers:
+        history = load_history(provider, ticker)
+        if len(history) < 2 * args.holdout_days // 7:
+            print(f"Skipping {ticker}: not enough history")
+            continue
+        for lookback in args.lookbacks:
+            for frequency in args.frequencies:
+                row = run_setting(prophet_stock, history, args.holdout_days, lookback, frequency)
+                row["ticker"] = ticker
+                rows.append(row)
+                print(f"{ticker}: lookback={lookback or 'all'} {frequency} fit {row['fit_s']}s MAPE {row['mape_pct']}%")
+
+    if not rows:
+        print("No tickers with enough history to benchmark")
+        return
+    results = summarize(rows)
+    header = f"{'lookback':>8} {'frequency':>9} {'rows':>7} {'fit s':>8} {'MAPE %':>8} {'coverage':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['lookback_years'] or 'all':>8} {row['frequency']:>9} {row['train_rows']:>7} "
+            f"{row['fit_s']:>8} {row['mape_pct']:>8} {row['coverage']:>8}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "runs": rows}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Offline benchmark for the /stocks pipeline.
+
+Runs the same code path as the /stocks route (quote cache, single-flight,
+bar store, rate limiter, bulk downloads, vectorized valuation) against the
+replay market data provider, so results do not depend on Yahoo Finance.
+Synthetic fixtures are generated deterministically unless --fixtures points
+at a recorded set (see services.market_data_provider.record_fixtures).
+
+For each portfolio size it reports throughput and p50/p99 latency for:
+  - cold:     first request, nothing stored locally (bar store is empty)
+  - stored:   quote cache cleared before each request, bars served from SQLite
+  - cached:   quotes served from the in-memory quote cache
+
+Usage (from the ai-server directory):
+    python -m benchmarks.stocks_benchmark --sizes 10 100 1000 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def generate_fixtures(fixtures_dir, tickers, days=520, seed=7):
+    """Writes geometric-random-walk daily bars for `tickers` in the replay fixture layout."""
+    os.makedirs(os.path.join(fixtures_dir, "history"), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days, name="Date")
+    for ticker in tickers:
+        returns = rng.normal(0.0003, 0.02, days)
+        close = 20 + rng.random() * 300 * np.exp(np.cumsum(returns))
+        dividends = np.zeros(days)
+        dividends[::63] = np.round(close[::63] * 0.005, 4)
+        frame = pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, 0.003, days)),
+            "High": close * 1.01,
+            "Low": close * 0.99,
+            "Close": close,
+            "Adj Close": close,
+            "Volume": rng.integers(100_000, 5_000_000, days),
+            "Dividends": dividends,
+            "Stock Splits": 0.0,
+        }, index=dates)
+        frame.to_csv(os.path.join(fixtures_dir, "history", f"{ticker}_1d.csv"))
+
+
+def bench_tickers(size, lots_per_ticker):
+    """Synthetic ticker symbols used for a portfolio of `size` positions."""
+    return [f"B{size}X{i}" for i in range(max(1, size // max(1, lots_per_ticker)))]
+
+
+def recorded_tickers(fixtures_dir):
+    """Tickers with recorded daily bars in a fixtures directory."""
+    suffix = "_1d.csv"
+    return sorted(name[:-len(suffix)] for name in os.listdir(os.path.join(fixtures_dir, "history")) if name.endswith(suffix))
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+async def run_requests(price_stocks, portfolio, requests, concurrency, before_each=None):
+    """Issues `requests` valuations with at most `concurrency` in flight; returns (latencies, wall seconds, errors)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            try:
+                await price_stocks(portfolio)
+            except Exception as e:
+                errors += 1
+                print(f"Request failed: {e}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started, errors
+
+
+def summarize(size, scenario, latencies, wall, errors):
+    return {
+        "positions": size,
+        "scenario": scenario,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "positions_per_second": round(len(latencies) * size / wall, 1) if wall else None,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def benchmark(args):
+    from python_types.types import StockItem
+    from services.market_data_provider import get_provider
+    from services.portfolio_service import price_stocks
+    from services.rate_limiter import yahoo_stats
+    from services.stocks_data import cache as quote_cache
+
+    provider = get_provider()
+    results = []
+    for size in args.sizes:
+        # Synthetic runs use distinct tickers per size so the first request is genuinely cold
+        tickers = recorded_tickers(args.fixtures) if args.fixtures else bench_tickers(size, args.lots_per_ticker)
+        portfolio = [
+            StockItem(
+                _id=str(i), userId="bench", stockName=f"Bench {i}", tickerSymbol=tickers[i % len(tickers)],
+                numberOfShares=1 + i % 50, purchasePrice=100.0, purchaseDate="2024-01-02",
+                createdAt="2024-01-02", updatedAt="2024-01-02", __v=0
+            )
+            for i in range(size)
+        ]
+
+        async def price(items):
+            return await price_stocks(items, timeout=args.timeout)
+
+        calls_before = provider.calls
+        latencies, wall, errors = await run_requests(price, portfolio, 1, 1)
+        row = summarize(size, "cold", latencies, wall, errors)
+        row["provider_calls"] = provider.calls - calls_before
+        results.append(row)
+
+        calls_before = provider.calls
+        latencies, wall, errors = await run_requests(price, portfolio, args.requests, args.concurrency, before_each=quote_cache.clear)
+        row = summarize(size, "stored", latencies, wall, errors)
+        row["provider_calls"] = provider.calls - calls_before
+        results.append(row)
+
+        await run_requests(price, portfolio, 1, 1)
+        calls_before = provider.calls
+        latencies, wall, errors = await run_requests(price, portfolio, args.requests, args.concurrency)
+        row = summarize(size, "cached", latencies, wall, errors)
+        row["provider_calls"] = provider.calls - calls_before
+        results.append(row)
+
+    return results, yahoo_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /stocks throughput and latency against replayed market data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Portfolio sizes (positions)")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per warm scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request quote deadline in seconds")
+    parser.add_argument("--lots-per-ticker", type=int, default=1, help="Lots sharing each ticker (1 = all distinct)")
+    parser.add_argument("--fixtures", help="Recorded fixtures directory (default: generate synthetic fixtures)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Injected upstream latency per call")
+    parser.add_argument("--error-rate", type=float, default=0, help="Injected 429 probability per call")
+    parser.add_argument("--rate", type=float, default=1000, help="Upstream requests per second allowed by the limiter")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stocks-bench-")
+    fixtures_dir = args.fixtures
+    if fixtures_dir is None:
+        fixtures_dir = os.path.join(workdir, "fixtures")
+        generate_fixtures(fixtures_dir, [t for size in args.sizes for t in bench_tickers(size, args.lots_per_ticker)])
+
+    # Configuration is read at import time, so set it before importing the services
+    os.environ.update({
+        "MARKET_DATA_PROVIDER": "replay",
+        "REPLAY_FIXTURES_DIR": fixtures_dir,
+        "REPLAY_LATENCY_MS": str(args.latency_ms),
+        "REPLAY_ERROR_RATE": str(args.error_rate),
+        "BAR_STORE_PATH": os.path.join(workdir, "market_bars.db"),
+        "CACHE_BACKEND": "memory",
+        "YAHOO_REQUESTS_PER_SECOND": str(args.rate),
+        "YAHOO_BURST": str(max(1, int(args.rate))),
+    })
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    results, limiter = asyncio.run(benchmark(args))
+
+    header = f"{'positions':>9} {'scenario':>8} {'req/s':>9} {'pos/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>6} {'upstream':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['positions']:>9} {row['scenario']:>8} {row['throughput_rps']:>9} {row['positions_per_second']:>10} "
+            f"{row['p50_ms']:>9} {row['p99_ms']:>9} {row['errors']:>6} {row['provider_calls']:>8}"
+        )
+    print(f"Limiter: {limiter}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "limiter": limiter}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,30 @@
-from fastapi import FastAPI, Form, HTTPException, Body, UploadFile, File
+from fastapi import FastAPI, Form, HTTPException, Body, UploadFile, File, Request, WebSocket
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from PyPDF2 import PdfReader
 from fastapi.templating import Jinja2Templates
 from typing import List, Dict, Optional
-import uuid, json, os, io, base64, tempfile, sqlite3, hashlib, re
+from email.utils import parsedate_to_datetime
+import uuid, json, os, io, base64, tempfile, sqlite3, hashlib, re, asyncio
 from dotenv import load_dotenv
 import stocks_data
 from services.gemini_game_flow import get_gemini_response
-from services.stocks_data import fetch_multiple_stocks
+from services.async_market_data import iter_stocks_async, STOCKS_REQUEST_TIMEOUT
+from services.stocks_data import cache as quote_cache, quote_flight
+from services.cache_backend import get_cache
+from services.rate_limiter import yahoo_stats
+from services.portfolio_valuation import value_portfolio, by_ticker_records
+from services.portfolio_service import price_stocks
+from services.risk_analytics import compute_portfolio_risk, DEFAULT_BENCHMARK
+from services.portfolio_store import DEFAULT_USER_ID
+from services import portfolio_revaluation
+from services.bond_analytics import analyze_bonds, bond_records
+from services.portfolio_history import get_portfolio_history
+from services.live_quotes import serve_portfolio_socket, hub as live_quote_hub
 from python_types.types import StockItem, ProphetRequest
 from services.reports import convert_markdown_to_pdf, create_summary_tables, save_to_db, extract_tables_from_text, get_existing_data, extract_text_with_mistral, analyze_with_gemini, chat_with_gemini_simple
-from predictive_analysis import prophet_stock
+from predictive_analysis import prophet_stock, forecast_jobs
 from services.chatbot import search_companies_by_query, SearchCompaniesRequest, initialize_graph_database, clear_chat, display_chat, generate_response, add_to_chat, genai, state, init_state, get_pdf_files_from_folders, ProcessDocumentsRequest, generate_database_id, extract_text_with_links, ChatRequest
 from services.business_model import extract_text, generate_business_models, generate_pdf
 from services.sentimental_analysis import extract_text_from_pdf, analyze_sentiment, create_pdf_report
@@ -35,8 +47,14 @@ templates = Jinja2Templates(directory="templates")
 DB_NAME = os.getenv("DB_NAME")
 DATABASE_DIR = os.getenv("DATABASE_DIR")
 
-analysis_cache: Dict[str, dict] = {}  # {file_hash: {file_name, extracted_text, analysis_result}}
-chat_histories: Dict[str, List[dict]] = {}  # {file_hash: [{role, content, image (optional)}]}
+# Per-process by default; set CACHE_BACKEND_ANALYSIS / CACHE_BACKEND_CHAT_HISTORIES=sqlite to share between workers
+analysis_cache = get_cache("analysis")  # {file_hash: {file_name, extracted_text, analysis_result}}
+chat_histories = get_cache("chat_histories")  # {file_hash: [{role, content, image (optional)}]}
+
+@app.on_event("startup")
+async def start_background_jobs():
+    if portfolio_revaluation.REVALUATION_INTERVAL_MINUTES > 0:
+        asyncio.create_task(portfolio_revaluation.run_revaluation_schedule())
 
 @app.post("/ai-financial-path")
 async def ai_financial_path(
@@ -50,64 +68,19 @@ async def ai_financial_path(
         raise HTTPException(status_code=500, detail=f"Something went wrong: {str(e)}")
     
 @app.post("/stocks")
-async def process_stocks(stocks_data: List[StockItem] = Body(...)):
+async def process_stocks(stocks_data: List[StockItem] = Body(...), timeout: float = STOCKS_REQUEST_TIMEOUT):
     """
     Processes a list of stocks from the frontend and returns enriched data.
     
     Expects an array of stock objects in the request body.
-    Returns the same array with additional market data.
+    Returns the same array with additional market data. Tickers that are not
+    resolved within `timeout` seconds are reported in the warnings.
     """
     try:
         if not stocks_data:
             raise HTTPException(status_code=400, detail="No stock data provided")
         
-        ticker_symbols = [stock.tickerSymbol for stock in stocks_data]
-        
-        all_stock_data = fetch_multiple_stocks(ticker_symbols, delay_between_requests=1)
-        
-        enriched_stocks = []
-        total_portfolio_value = 0
-        failed_tickers = []
-        
-        for stock in stocks_data:
-            stock_info = all_stock_data.get(stock.tickerSymbol, {"currentPrice": None, "dividendYield": None})
-            
-            if stock_info["currentPrice"] is None:
-                failed_tickers.append(stock.tickerSymbol)
-                continue
-            
-            unrealized_gains_losses = round((stock_info["currentPrice"] - stock.purchasePrice) * stock.numberOfShares, 2)
-            
-            stock_value = stock_info["currentPrice"] * stock.numberOfShares
-            total_portfolio_value += stock_value
-            
-            enriched_stock = stock.dict()
-            enriched_stock.update({
-                "currentPrice": stock_info["currentPrice"],
-                "unrealizedGainsLosses": unrealized_gains_losses,
-                "dividendYield": stock_info["dividendYield"],
-                "stockValue": round(stock_value, 2)
-            })
-            
-            enriched_stocks.append(enriched_stock)
-        
-        if len(failed_tickers) == len(ticker_symbols):
-            raise HTTPException(
-                status_code=503, 
-                detail="Service temporarily unavailable. Could not fetch any stock data due to rate limiting."
-            )
-        
-        for stock in enriched_stocks:
-            stock["weightageInPortfolio"] = round((stock["stockValue"] / total_portfolio_value) * 100, 2) if total_portfolio_value > 0 else 0
-        
-        response_data = {
-            "message": "Stock data processed successfully!",
-            "totalPortfolioValue": round(total_portfolio_value, 2),
-            "stocks": enriched_stocks
-        }
-    
-        if failed_tickers:
-            response_data["warnings"] = f"Could not fetch data for these tickers: {', '.join(failed_tickers)}"
+        response_data = await price_stocks(stocks_data, timeout=timeout)
         
         return JSONResponse(content=response_data, status_code=200)
         
@@ -115,6 +88,112 @@ async def process_stocks(stocks_data: List[StockItem] = Body(...)):
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing stocks: {str(e)}")
+
+@app.post("/stocks/stream")
+async def stream_stocks(stocks_data: List[StockItem] = Body(...), timeout: float = STOCKS_REQUEST_TIMEOUT):
+    """
+    Streaming variant of /stocks that emits NDJSON as quotes arrive.
+    
+    Each line is a JSON object with a "type":
+      - "position": one enriched stock (with its "index" in the request) as soon
+        as its ticker's quote resolves; weightage is not known yet
+      - "summary": the last line, with totalPortfolioValue, per-position
+        weightages, positionsByTicker and warnings for failed tickers
+    """
+    if not stocks_data:
+        raise HTTPException(status_code=400, detail="No stock data provided")
+    
+    ticker_symbols = [stock.tickerSymbol for stock in stocks_data]
+    shares = [stock.numberOfShares for stock in stocks_data]
+    purchase_prices = [stock.purchasePrice for stock in stocks_data]
+    
+    lots_by_ticker = {}
+    for index, ticker in enumerate(ticker_symbols):
+        lots_by_ticker.setdefault(ticker, []).append(index)
+    
+    def ndjson(record):
+        return json.dumps(record) + "\n"
+    
+    async def generate():
+        quotes = {}
+        try:
+            async for ticker, quote in iter_stocks_async(ticker_symbols, timeout=timeout):
+                quotes[ticker] = quote
+                if quote.get("currentPrice") is None:
+                    continue
+                indices = lots_by_ticker[ticker]
+                partial = value_portfolio(
+                    [ticker] * len(indices),
+                    [shares[i] for i in indices],
+                    [purchase_prices[i] for i in indices],
+                    {ticker: quote}
+                )["lots"]
+                for index, row in zip(indices, partial.to_dict(orient="records")):
+                    enriched_stock = stocks_data[index].dict()
+                    enriched_stock.update({
+                        "currentPrice": quote["currentPrice"],
+                        "unrealizedGainsLosses": row["unrealizedGainsLosses"],
+                        "dividendYield": quote.get("dividendYield"),
+                        "stockValue": row["stockValue"]
+                    })
+                    yield ndjson({"type": "position", "index": index, "stock": enriched_stock})
+        except Exception as e:
+            print(f"Error while streaming stock data: {e}")
+        
+        valuation = value_portfolio(ticker_symbols, shares, purchase_prices, quotes)
+        lots = valuation["lots"]
+        summary = {
+            "type": "summary",
+            "totalPortfolioValue": round(valuation["totalPortfolioValue"], 2),
+            "weightages": [
+                {"index": int(index), "tickerSymbol": ticker, "weightageInPortfolio": float(weight)}
+                for index, ticker, weight in zip(lots.index, lots["tickerSymbol"], lots["weightageInPortfolio"])
+                if lots.at[index, "priced"]
+            ],
+            "positionsByTicker": by_ticker_records(valuation["byTicker"]),
+            "failedTickers": valuation["failedTickers"]
+        }
+        if valuation["failedTickers"]:
+            summary["warnings"] = f"Could not fetch data for these tickers: {', '.join(valuation['failedTickers'])}"
+        yield ndjson(summary)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/portfolio")
+async def live_portfolio(websocket: WebSocket):
+    """
+    Pushes live valuations for subscribed holdings.
+    
+    Send {"type": "subscribe", "stocks": [...]} or {"type": "subscribe", "userId": "..."};
+    the server replies with "positions" messages containing only the lots whose
+    value changed. Quotes come from one shared poller per distinct ticker.
+    """
+    await websocket.accept()
+    await serve_portfolio_socket(websocket, stocks_data.load_stocks_data)
+
+@app.get("/stocks/live_stats")
+async def get_live_stats():
+    """
+    Returns the number of polled tickers and live subscriptions.
+    """
+    return live_quote_hub.stats()
+
+@app.get("/stocks/cache_stats")
+async def get_quote_cache_stats():
+    """
+    Returns hit/miss/stale counters for the quote cache and in-flight fetch coalescing.
+    """
+    return {
+        "quote_cache": quote_cache.stats(),
+        "single_flight": {**quote_flight.stats, "in_flight": quote_flight.in_flight()}
+    }
+
+@app.get("/market_data/limiter_stats")
+async def get_limiter_stats():
+    """
+    Returns Yahoo Finance rate limiter queue wait times and circuit breaker state.
+    """
+    return yahoo_stats()
     
 
 @app.post("/analyze")
@@ -228,12 +307,14 @@ async def chat(
     chat_entry = {"role": "user", "content": query}
     if image:
         chat_entry["image"] = base64.b64encode(image_bytes).decode('utf-8') 
-    chat_histories[file_hash].append(chat_entry)
-    chat_histories[file_hash].append({"role": "assistant", "content": response})
+    history = chat_histories.get(file_hash, [])
+    history.append(chat_entry)
+    history.append({"role": "assistant", "content": response})
+    chat_histories[file_hash] = history
     
     return {
         "response": response,
-        "chat_history": chat_histories[file_hash]
+        "chat_history": history
     }
 
 @app.get("/chat_history/{file_hash}")
@@ -256,23 +337,166 @@ async def get_available_documents():
 @app.post("/prophet_stock")
 async def prophet_stock_route(request: ProphetRequest):
     try:
-        prophet_images = prophet_stock.main(request.years)
-        return JSONResponse(content={"prophet_images": prophet_images})
+        result = await asyncio.to_thread(
+            prophet_stock.main, request.years,
+            lookback_years=request.lookback_years, frequency=request.frequency,
+            output=request.output, max_points=request.max_points, encoding=request.encoding,
+            engine=request.engine
+        )
+        return JSONResponse(content=result)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
+
+@app.post("/prophet_stock/jobs", status_code=202)
+async def submit_prophet_job(request: ProphetRequest, user_id: str = DEFAULT_USER_ID):
+    """
+    Queues a forecast of the user's portfolio and returns its job id immediately.
+    An identical submission while the job is queued, running or recently
+    completed returns the existing job.
+    """
+    try:
+        job_id, reused = await asyncio.to_thread(
+            forecast_jobs.submit_job, request.years, user_id,
+            lookback_years=request.lookback_years, frequency=request.frequency,
+            output=request.output, max_points=request.max_points, encoding=request.encoding,
+            engine=request.engine
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"deduplicated": reused, **forecast_jobs.job_status(job_id)}
+
+@app.get("/prophet_stock/jobs/{job_id}")
+async def prophet_job_status(job_id: str):
+    """
+    Returns a forecast job's status and per-ticker progress.
+    """
+    status = forecast_jobs.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/prophet_stock/jobs/{job_id}/results")
+async def prophet_job_results(job_id: str):
+    """
+    Returns the forecasts a job has completed so far.
+    """
+    results = forecast_jobs.job_results(job_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return results
     
+def _not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    """Evaluates If-None-Match (preferred) or If-Modified-Since against the current representation."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
 @app.get("/portfolio_data")
-async def get_stocks_data():
+async def get_stocks_data(request: Request, user_id: str = DEFAULT_USER_ID):
+    """
+    Handles GET requests to return the user's stored stock and bond data in JSON format.
+    
+    The serialized portfolio is cached until the holdings change. Responses carry
+    ETag and Last-Modified, and conditional requests get a bodiless 304 when the
+    client's copy is current.
+    """
+    try:
+        snapshot = stocks_data.get_portfolio_snapshot(user_id)
+        headers = {"ETag": snapshot["etag"], "Cache-Control": "no-cache"}
+        if snapshot["last_modified"]:
+            headers["Last-Modified"] = snapshot["last_modified"]
+        if _not_modified(request, snapshot["etag"], snapshot["last_modified"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/portfolio_risk")
+async def get_portfolio_risk(benchmark: str = DEFAULT_BENCHMARK, lookback_days: int = 365, user_id: str = DEFAULT_USER_ID):
+    """
+    Returns volatility, beta, correlation/covariance, historical VaR/CVaR and
+    max drawdown for the stored portfolio, computed from locally cached history.
+    """
+    try:
+        stocks = stocks_data.load_stocks_data(user_id)
+        bonds = stocks_data.load_bonds_data(user_id)
+        bond_value = stocks_data.calculate_total_bond_value(bonds)
+        risk = await asyncio.to_thread(compute_portfolio_risk, stocks, bond_value, benchmark, lookback_days)
+        return JSONResponse(content=risk)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/portfolio_history")
+async def get_portfolio_history_route(user_id: str = DEFAULT_USER_ID, include_positions: bool = False):
+    """
+    Returns the stored portfolio's daily value, invested cost, gain and
+    time-weighted cumulative return from the earliest purchase date to the last
+    close, with each position's contribution to total P&L. Results are cached
+    until the next market close.
+    """
+    try:
+        stocks = stocks_data.load_stocks_data(user_id)
+        history = await asyncio.to_thread(get_portfolio_history, stocks, include_positions)
+        return JSONResponse(content=history)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/bond_analytics")
+async def get_bond_analytics(user_id: str = DEFAULT_USER_ID):
+    """
+    Returns clean/dirty price, accrued interest, Macaulay and modified duration
+    and convexity for each of the user's bonds, plus value-weighted book totals.
+    """
+    try:
+        bonds = stocks_data.load_bonds_data(user_id)
+        analytics = analyze_bonds(bonds)
+        records = [{**bond, **metrics} for bond, metrics in zip(bonds, bond_records(analytics))]
+        market_value = float(analytics["marketValue"].sum()) if len(analytics) else 0.0
+        priced = analytics[analytics["priced"]] if len(analytics) else analytics
+        weights = priced["marketValue"] / priced["marketValue"].sum() if len(priced) and priced["marketValue"].sum() else None
+        return {
+            "bonds": records,
+            "totalMarketValue": round(market_value, 2),
+            "totalAccruedInterest": round(float(priced["accruedInterest"].sum()), 2) if len(priced) else 0.0,
+            "modifiedDuration": round(float((weights * priced["modifiedDuration"]).sum()), 4) if weights is not None else None,
+            "convexity": round(float((weights * priced["convexity"]).sum()), 4) if weights is not None else None
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/portfolio/revalue")
+async def revalue_portfolios():
     """
-    Handles GET requests to return the stored stock and bond data in JSON format.
+    Revalues every stored portfolio now: fetches each distinct ticker once in bulk
+    and writes back price, P&L and weightage for all users.
     """
     try:
-        stocks_df = stocks_data.load_stocks_data()
-        bonds_data = stocks_data.load_bonds_data()
-        return JSONResponse(content={'stocks': stocks_df, 'bonds': bonds_data})
+        return await asyncio.to_thread(portfolio_revaluation.revalue_all_portfolios)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/portfolio/revalue/status")
+async def revaluation_status():
+    """
+    Returns the summary of the last batch revaluation.
+    """
+    return {
+        "intervalMinutes": portfolio_revaluation.REVALUATION_INTERVAL_MINUTES,
+        "lastRun": portfolio_revaluation.last_run or None
+    }
+
 @app.get("/default_pdfs", response_model=Dict[str, List[Dict[str, str]]])
 async def get_default_pdfs():
     default_pdfs = get_pdf_files_from_folders()
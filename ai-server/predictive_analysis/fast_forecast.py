@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bootstrap paths per ticker; more paths give smoother bands at linear cost
+FAST_FORECAST_PATHS = int(os.getenv("FAST_FORECAST_PATHS", "200"))
+# Fixed seed so repeated requests on the same data return identical bands
+FAST_FORECAST_SEED = int(os.getenv("FAST_FORECAST_SEED", "7"))
+# Matches Prophet's default uncertainty interval
+INTERVAL_WIDTH = 0.8
+
+
+def forecast_drift(df, future_dates, paths=FAST_FORECAST_PATHS, interval_width=INTERVAL_WIDTH, seed=FAST_FORECAST_SEED):
+    """
+    Forecasts one price series with log-linear drift and bootstrap bands.
+
+    The central forecast extends the last log price by the mean log return per
+    observation. Bands come from `paths` simulated futures, each a cumulative
+    sum of historical log returns resampled with replacement; their quantiles
+    at every horizon give yhat_lower and yhat_upper. Horizons are measured in
+    observations, using the training data's observations per year, so daily,
+    weekly and monthly training data all map onto calendar dates correctly.
+
+    Args:
+        df (pd.DataFrame): 'ds'/'y' training data, oldest first.
+        future_dates (pd.DatetimeIndex): Dates to forecast, after the last observation.
+        paths (int): Number of bootstrap paths.
+        interval_width (float): Probability mass inside the bands.
+        seed (int): Random seed for the bootstrap.
+
+    Returns:
+        pd.DataFrame: Prophet-shaped forecast (ds, yhat, yhat_lower, yhat_upper).
+            History rows carry the observed price with no band.
+    """
+    ds = pd.to_datetime(df['ds']).to_numpy(dtype='datetime64[ns]')
+    y = df['y'].to_numpy(dtype=np.float64)
+    valid = y > 0
+    ds, y = ds[valid], y[valid]
+    if len(y) < 3:
+        raise ValueError("Not enough price history for a drift forecast")
+
+    log_prices = np.log(y)
+    returns = np.diff(log_prices)
+    drift = returns.mean()
+    span_years = (ds[-1] - ds[0]) / np.timedelta64(1, 'D') / 365.25
+    per_year = len(returns) / span_years if span_years > 0 else 252.0
+
+    future = pd.DatetimeIndex(future_dates).to_numpy(dtype='datetime64[ns]')
+    future_years = (future - ds[-1]) / np.timedelta64(1, 'D') / 365.25
+    steps = np.maximum(np.rint(future_years * per_year).astype(np.int64), 0)
+
+    rng = np.random.default_rng(seed)
+    max_steps = int(steps.max()) if len(steps) else 0
+    # Horizons by paths, so each horizon's outcomes are contiguous for the partition below
+    draws = returns[rng.integers(0, len(returns), size=(max_steps, paths))]
+    cumulative = np.concatenate([np.zeros((1, paths)), np.cumsum(draws, axis=0)], axis=0)
+    # Nearest-rank quantiles, computed once per distinct horizon (daily dates share trading-day steps)
+    tail = (1 - interval_width) / 2
+    low_rank, high_rank = int(round(tail * (paths - 1))), int(round((1 - tail) * (paths - 1)))
+    unique_steps, inverse = np.unique(steps, return_inverse=True)
+    ranked = np.partition(cumulative[unique_steps], [low_rank, high_rank], axis=1)
+    lower, upper = ranked[:, low_rank][inverse], ranked[:, high_rank][inverse]
+
+    last = log_prices[-1]
+    return pd.DataFrame({
+        'ds': np.concatenate([ds, future]),
+        'yhat': np.concatenate([y, np.exp(last + drift * steps)]),
+        'yhat_lower': np.concatenate([y, np.exp(last + lower)]),
+        'yhat_upper': np.concatenate([y, np.exp(last + upper)]),
+    })
+
+
+def forecast_many(frames, years, freq, periods_per_year):
+    """
+    Runs forecast_drift for every ticker of a portfolio over the same horizon.
+
+    Args:
+        frames (dict): symbol -> 'ds'/'y' training data.
+        years (int): Forecast horizon in years.
+        freq (str): pandas offset for the future dates.
+        periods_per_year (int): Future dates per year at `freq`.
+
+    Returns:
+        dict: symbol -> forecast DataFrame, or the exception raised for that symbol.
+    """
+    forecasts = {}
+    for symbol, df in frames.items():
+        try:
+            last = pd.Timestamp(df['ds'].iloc[-1])
+            periods = years * periods_per_year
+            future = pd.date_range(start=last, periods=periods + 1, freq=freq)
+            forecasts[symbol] = forecast_drift(df, future[future > last][:periods])
+        except Exception as e:
+            forecasts[symbol] = e
+    return forecasts
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from predictive_analysis import prophet_stock
+from services import portfolio_store
+import stocks_data
+
+load_dotenv()
+
+# Jobs run at the same time; each one already fans its tickers out over the Prophet process pool
+FORECAST_JOB_WORKERS = int(os.getenv("FORECAST_JOB_WORKERS", "1"))
+# Finished jobs are kept (and reused for identical submissions) for this long
+FORECAST_JOB_TTL_SECONDS = float(os.getenv("FORECAST_JOB_TTL_SECONDS", "3600"))
+# Job state lives in SQLite so every uvicorn worker can answer polls and deduplicate submissions
+FORECAST_JOBS_DB_PATH = os.getenv("FORECAST_JOBS_DB_PATH", "./database/forecast_jobs.db")
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+_executor = None
+
+ACTIVE_STATES = ("queued", "running")
+
+
+def _create_schema(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_jobs (
+            job_id TEXT PRIMARY KEY,
+            key TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT,
+            created REAL,
+            started_at TEXT,
+            finished_at TEXT,
+            finished REAL,
+            error TEXT,
+            symbols TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_job_tickers (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            result TEXT,
+            PRIMARY KEY (job_id, symbol)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_forecast_jobs_key ON forecast_jobs (key)")
+
+
+def _connect():
+    """Returns this thread's connection to the job store, creating the schema on first use."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(FORECAST_JOBS_DB_PATH) or ".", exist_ok=True)
+        # Autocommit mode: write transactions are opened explicitly in _transaction
+        conn = sqlite3.connect(FORECAST_JOBS_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                _create_schema(conn)
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """Runs a write transaction; BEGIN IMMEDIATE serializes submissions across workers."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _get_executor():
+    global _executor
+    with _init_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, FORECAST_JOB_WORKERS), thread_name_prefix="forecast-job")
+        return _executor
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _job_key(user_id, version, params):
+    payload = json.dumps([user_id, version, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _prune(conn, now):
+    """
+    Drops finished jobs older than the TTL, with their tickers.
+
+    A job still queued or running a TTL after it was created lost its worker
+    (e.g. the process was restarted) and is marked failed so it is not reused.
+    """
+    conn.execute(
+        "UPDATE forecast_jobs SET status = 'failed', error = 'Job was abandoned by its worker', finished_at = ?, finished = ? "
+        "WHERE status IN (?, ?) AND created < ?",
+        (_now(), now, *ACTIVE_STATES, now - FORECAST_JOB_TTL_SECONDS)
+    )
+    expired = [
+        row["job_id"] for row in conn.execute(
+            "SELECT job_id FROM forecast_jobs WHERE status NOT IN (?, ?) AND finished < ?",
+            (*ACTIVE_STATES, now - FORECAST_JOB_TTL_SECONDS)
+        )
+    ]
+    for job_id in expired:
+        conn.execute("DELETE FROM forecast_job_tickers WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM forecast_jobs WHERE job_id = ?", (job_id,))
+
+
+def submit_job(years, user_id=stocks_data.DEFAULT_USER_ID, lookback_years=None, frequency="daily",
+               output="image", max_points=prophet_stock.FORECAST_MAX_POINTS, encoding="json", engine="prophet"):
+    """
+    Queues a forecast of a user's portfolio and returns at once.
+
+    Submissions are identified by user, portfolio version and forecast
+    parameters. An identical submission while a job is queued or running, or
+    after it completed within the TTL, returns that job instead of starting a
+    new one; editing the portfolio changes its version and starts fresh.
+    Jobs are stored in SQLite, so this holds across uvicorn workers and any
+    worker can answer status and results polls; the job itself runs in the
+    worker that accepted it.
+
+    Returns:
+        (job id, True if an existing job was reused)
+    """
+    if frequency not in prophet_stock.FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {frequency}")
+    if engine not in prophet_stock.ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+    params = {
+        "years": years, "lookbackYears": lookback_years, "frequency": frequency,
+        "output": output, "maxPoints": max_points, "encoding": encoding, "engine": engine,
+    }
+    key = _job_key(user_id, portfolio_store.portfolio_version(user_id), params)
+
+    with _transaction() as conn:
+        now = time.time()
+        _prune(conn, now)
+        existing = conn.execute(
+            "SELECT job_id FROM forecast_jobs WHERE key = ? AND status != 'failed' ORDER BY created DESC LIMIT 1",
+            (key,)
+        ).fetchone()
+        if existing is not None:
+            return existing["job_id"], True
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO forecast_jobs (job_id, key, user_id, params, status, created_at, created, symbols) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, key, user_id, json.dumps(params), "queued", _now(), now, "[]")
+        )
+
+    _get_executor().submit(_run_job, job_id, user_id, params)
+    return job_id, False
+
+
+def _update_job(job_id, **changes):
+    with _transaction() as conn:
+        columns = ", ".join(f"{name} = ?" for name in changes)
+        conn.execute(f"UPDATE forecast_jobs SET {columns} WHERE job_id = ?", (*changes.values(), job_id))
+
+
+def _update_ticker(job_id, symbol, status, error=None, result=None):
+    with _transaction() as conn:
+        conn.execute(
+            "UPDATE forecast_job_tickers SET status = ?, error = ?, result = ? WHERE job_id = ? AND symbol = ?",
+            (status, error, json.dumps(result) if result is not None else None, job_id, symbol)
+        )
+
+
+def _run_job(job_id, user_id, params):
+    _update_job(job_id, status="running", started_at=_now())
+
+    def on_result(symbol, result, error):
+        if error is None:
+            _update_ticker(job_id, symbol, "completed", result=result)
+        else:
+            _update_ticker(job_id, symbol, "failed", str(error))
+
+    try:
+        holdings = stocks_data.load_stocks_data(user_id)
+        symbols = prophet_stock.portfolio_symbols(holdings)
+        with _transaction() as conn:
+            conn.execute(
+                "UPDATE forecast_jobs SET symbols = ? WHERE job_id = ?",
+                (json.dumps([stock["tickerSymbol"] for stock in holdings if stock.get("tickerSymbol")]), job_id)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO forecast_job_tickers (job_id, seq, symbol, status) VALUES (?, ?, ?, 'loading')",
+                [(job_id, seq, symbol) for seq, symbol in enumerate(symbols)]
+            )
+
+        training = prophet_stock.load_training_data(symbols, params["lookbackYears"], params["frequency"])
+        for symbol in symbols:
+            if symbol in training:
+                _update_ticker(job_id, symbol, "fitting")
+            else:
+                _update_ticker(job_id, symbol, "failed", "No price history available")
+
+        results = prophet_stock._run_forecasts(
+            training, params["years"], params["frequency"], on_result=on_result, engine=params["engine"],
+            lookback_years=params["lookbackYears"],
+            output=params["output"], max_points=params["maxPoints"], encoding=params["encoding"]
+        )
+        if symbols and not results:
+            # Nothing to show (e.g. the history sync was throttled); failed jobs are not reused
+            status, error = "failed", "No ticker could be forecast"
+        else:
+            status, error = "completed", None
+    except Exception as e:
+        print(f"Forecast job {job_id} failed: {e}")
+        status, error = "failed", str(e)
+
+    _update_job(job_id, status=status, error=error, finished_at=_now(), finished=time.time())
+
+
+def _load_job(conn, job_id):
+    job = conn.execute("SELECT * FROM forecast_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if job is None or (job["status"] not in ACTIVE_STATES and time.time() - job["finished"] > FORECAST_JOB_TTL_SECONDS):
+        return None, []
+    tickers = conn.execute(
+        "SELECT symbol, status, error, result FROM forecast_job_tickers WHERE job_id = ? ORDER BY seq", (job_id,)
+    ).fetchall()
+    return job, tickers
+
+
+def job_status(job_id):
+    """Returns the job's state and per-ticker progress, or None if the job is unknown or expired."""
+    job, rows = _load_job(_connect(), job_id)
+    if job is None:
+        return None
+    tickers = [{"symbol": row["symbol"], "status": row["status"], "error": row["error"]} for row in rows]
+    return {
+        "jobId": job["job_id"],
+        "status": job["status"],
+        "params": json.loads(job["params"]),
+        "createdAt": job["created_at"],
+        "startedAt": job["started_at"],
+        "finishedAt": job["finished_at"],
+        "error": job["error"],
+        "progress": {
+            "total": len(tickers),
+            "completed": sum(t["status"] == "completed" for t in tickers),
+            "failed": sum(t["status"] == "failed" for t in tickers),
+        },
+        "tickers": tickers,
+    }
+
+
+def job_results(job_id):
+    """
+    Returns the forecasts finished so far, or None if the job is unknown or expired.
+
+    Finished tickers are arranged as POST /prophet_stock returns them
+    (see prophet_stock.collect_results).
+    """
+    job, rows = _load_job(_connect(), job_id)
+    if job is None:
+        return None
+    results = {row["symbol"]: json.loads(row["result"]) for row in rows if row["status"] == "completed"}
+    output = json.loads(job["params"])["output"]
+    return {
+        "jobId": job["job_id"],
+        "status": job["status"],
+        "error": job["error"],
+        **prophet_stock.collect_results(json.loads(job["symbols"]), results, output),
+        "pending": [row["symbol"] for row in rows if row["status"] in ("loading", "fitting")],
+    }
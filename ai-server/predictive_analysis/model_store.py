@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from dotenv import load_dotenv
+from prophet.serialize import model_from_json, model_to_json
+
+load_dotenv()
+
+PROPHET_MODEL_DIR = os.getenv("PROPHET_MODEL_DIR", "./database/prophet_models")
+
+
+def _safe(symbol):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+
+
+def params_hash(params):
+    """Stable short hash of a hyperparameter dictionary."""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def model_key(symbol, df, params):
+    """
+    Identifies a fitted model by ticker, training window and hyperparameters.
+
+    The training window is summarized by its first and last observation dates
+    and row count, so a new daily bar (or a different lookback) produces a new
+    key while repeated requests on the same data reuse the stored fit.
+    """
+    first, last = df["ds"].iloc[0], df["ds"].iloc[-1]
+    window = f"{first:%Y%m%d}-{last:%Y%m%d}-{len(df)}"
+    return f"{_safe(symbol)}__{params_hash(params)}__{window}"
+
+
+def _path(key):
+    return os.path.join(PROPHET_MODEL_DIR, f"{key}.json")
+
+
+def load_model(key):
+    """Returns the stored model for `key`, or None if there is none (or it cannot be read)."""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return model_from_json(f.read())
+    except Exception as e:
+        print(f"Could not load cached model {key}: {e}")
+        return None
+
+
+def load_previous_model(key):
+    """
+    Returns the stored fit for the same ticker and parameters as `key` but an
+    older training window, or None. Used to warm-start a refit when new bars arrive.
+    """
+    if not os.path.isdir(PROPHET_MODEL_DIR):
+        return None
+    prefix = key.rsplit("__", 1)[0] + "__"
+    candidates = [
+        os.path.join(PROPHET_MODEL_DIR, name) for name in os.listdir(PROPHET_MODEL_DIR)
+        if name.startswith(prefix) and name != f"{key}.json" and name.endswith(".json")
+    ]
+    for path in sorted(candidates, key=os.path.getmtime, reverse=True):
+        previous = load_model(os.path.basename(path)[:-len(".json")])
+        if previous is not None:
+            return previous
+    return None
+
+
+def save_model(key, model):
+    """
+    Stores a fitted model and removes older fits of the same ticker and parameters.
+
+    The file is written to a temporary name and renamed into place, so
+    concurrent workers never read a partially written model.
+    """
+    os.makedirs(PROPHET_MODEL_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PROPHET_MODEL_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(model_to_json(model))
+        os.replace(tmp_path, _path(key))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    prefix = key.rsplit("__", 1)[0] + "__"
+    for name in os.listdir(PROPHET_MODEL_DIR):
+        if name.startswith(prefix) and name != f"{key}.json" and name.endswith(".json"):
+            try:
+                os.remove(os.path.join(PROPHET_MODEL_DIR, name))
+            except OSError:
+                pass
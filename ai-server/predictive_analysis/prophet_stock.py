@@ -1,29 +1,47 @@
-import yfinance as yf
 from prophet import Prophet
+import matplotlib
+matplotlib.use("Agg")  # Plots are rendered in worker processes without a display
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import json, os, base64
+import multiprocessing, os, io, base64, threading, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+from services import bar_store
+from predictive_analysis import model_store, fast_forecast
+import stocks_data
+
+load_dotenv()
+
+# Worker processes for fitting; "spawn" avoids forking the threaded web server
+PROPHET_WORKERS = int(os.getenv("PROPHET_WORKERS", str(os.cpu_count() or 1)))
+PROPHET_START_METHOD = os.getenv("PROPHET_START_METHOD", "spawn")
+
+# Points per returned forecast series; longer horizons are downsampled to this many
+FORECAST_MAX_POINTS = int(os.getenv("FORECAST_MAX_POINTS", "500"))
+
+_pool = None
+_pool_lock = threading.Lock()
 
 def fetch_stock_data(symbol, start_date, end_date):
     """
-    Fetches historical stock data from Yahoo Finance.
+    Fetches historical stock data from the local bar store, syncing new bars from Yahoo Finance.
     
     Attempts to get more granular data (daily) if available, otherwise falls back to weekly.
     """
-    stock = yf.Ticker(symbol)
-
     # Try to get daily data first
-    df = stock.history(start=start_date, end=end_date, interval="1d")
+    df = bar_store.get_bars(symbol, "1d", start=start_date, end=end_date)
     
     if df.empty:
         print(f"No daily data found for {symbol}, trying weekly interval...")
         # If daily data is not available, try weekly data
-        df = stock.history(start=start_date, end=end_date, interval="1wk")
+        df = bar_store.get_bars(symbol, "1wk", start=start_date, end=end_date)
 
         if df.empty:
             print(f"No weekly data found for {symbol}, trying monthly interval...")
             # If weekly data is not available, try monthly data
-            df = stock.history(start=start_date, end=end_date, interval="1mo")
+            df = bar_store.get_bars(symbol, "1mo", start=start_date, end=end_date)
 
     if df.empty:
         print(f"No data found for {symbol} between {start_date} and {end_date}.")
@@ -32,26 +50,87 @@ def fetch_stock_data(symbol, start_date, end_date):
     df.reset_index(inplace=True)
     df = df[['Date', 'Close']]
     df.columns = ['ds', 'y']  # Prophet requires columns 'ds' and 'y'
-    df['ds'] = df['ds'].dt.tz_localize(None)  # Remove timezone information
+    df['ds'] = pd.to_datetime(df['ds'])  # Bar store dates are already timezone-naive
     return df
 
-def predict_future_prices(df, years, seasonality_mode='additive', changepoint_prior_scale=0.05, holidays_prior_scale=10, seasonality_prior_scale=10, growth='linear'):
+# --- Model Tuning Parameters ---
+# Experiment with these to potentially improve accuracy. They are part of the
+# model cache key, so changing them refits on the next request.
+MODEL_PARAMS = {
+    'seasonality_mode': 'multiplicative',  # Try 'additive' too
+    'changepoint_prior_scale': 0.15,  # Increased flexibility for trend changes, was 0.1
+    'holidays_prior_scale': 15,  # Increased impact of holidays, was 10
+    'seasonality_prior_scale': 15,  # Increased impact of seasonality, was 10
+    'growth': 'linear',  # Try 'logistic' if you expect saturation
+}
+
+
+def _month_end_alias():
+    """'ME' on pandas >= 2.2 (where 'M' is deprecated, then removed in 3.0), 'M' on older pandas."""
+    try:
+        pd.tseries.frequencies.to_offset('ME')
+        return 'ME'
+    except ValueError:
+        return 'M'
+
+
+# Training frequency -> (pandas offset used for resampling and future dates, periods per year)
+FREQUENCIES = {
+    'daily': ('D', 365),
+    'weekly': ('W-FRI', 52),
+    'monthly': (_month_end_alias(), 12),
+}
+
+# 'prophet' fits a Stan model per ticker; 'fast' is the NumPy drift engine in fast_forecast
+ENGINES = ('prophet', 'fast')
+
+def prepare_training_data(df, lookback_years=None, frequency='daily'):
     """
-    Trains a Prophet model and makes predictions.
+    Trims history to the lookback window and resamples it to the training frequency.
+
+    Resampling keeps the last close of each week or month, stamped with the
+    date it was actually observed, using one vectorized groupby.
+
+    Args:
+        df (pd.DataFrame): Daily 'ds'/'y' history, oldest first.
+        lookback_years (int): Years of history to keep (None keeps everything).
+        frequency (str): 'daily', 'weekly' or 'monthly'.
+
+    Returns:
+        pd.DataFrame: 'ds'/'y' training data.
+    """
+    if lookback_years:
+        df = df[df['ds'] >= df['ds'].iloc[-1] - pd.DateOffset(years=lookback_years)]
+    if frequency != 'daily':
+        rule = FREQUENCIES[frequency][0]
+        df = (
+            df.groupby(pd.Grouper(key='ds', freq=rule))
+            .agg(ds=('ds', 'last'), y=('y', 'last'))
+            .dropna()
+        )
+    return df.reset_index(drop=True)
+
+def fit_model(df, seasonality_mode='additive', changepoint_prior_scale=0.05, holidays_prior_scale=10, seasonality_prior_scale=10, growth='linear', frequency='daily', init=None):
+    """
+    Trains a Prophet model.
+
+    Weekly and monthly data cannot resolve daily or weekly cycles or single
+    holidays, so those components are only used for daily training data.
 
     Args:
         df (pd.DataFrame): DataFrame with 'ds' (datestamp) and 'y' (value) columns.
-        years (int): Number of years to predict into the future.
         seasonality_mode (str): 'additive' or 'multiplicative'.
         changepoint_prior_scale (float): Adjust the flexibility of the trend.
         holidays_prior_scale (float): Adjust the strength of holidays effects.
         seasonality_prior_scale (float): Adjust the strength of seasonality effects.
         growth (str): 'linear' or 'logistic' - type of growth curve.
+        frequency (str): Sampling frequency of `df` ('daily', 'weekly' or 'monthly').
+        init (dict): Starting parameter values for the optimizer (see stan_init).
     
     Returns:
         Prophet: Trained Prophet model.
-        pd.DataFrame: Forecast DataFrame.
     """
+    daily = frequency == 'daily'
 
     # For logistic growth, we need to specify a carrying capacity
     if growth == 'logistic':
@@ -65,42 +144,124 @@ def predict_future_prices(df, years, seasonality_mode='additive', changepoint_pr
         changepoint_prior_scale=changepoint_prior_scale,
         holidays_prior_scale=holidays_prior_scale,
         seasonality_prior_scale=seasonality_prior_scale,
-        daily_seasonality=True,
-        weekly_seasonality=True,
+        daily_seasonality=daily,
+        weekly_seasonality=daily,
         yearly_seasonality=True
     )
 
     # Add specific holidays (example for US)
-    model.add_country_holidays(country_name='US')
+    if daily:
+        model.add_country_holidays(country_name='US')
 
-    model.fit(df)
-    future = model.make_future_dataframe(periods=years * 365)
+    if init is not None:
+        model.fit(df, init=init)
+    else:
+        model.fit(df)
+    return model
+
+def stan_init(model):
+    """
+    Extracts a fitted model's parameters as optimizer starting values.
+
+    A refit on the same series with a few more bars starts next to its
+    optimum, so the optimizer converges in a fraction of the iterations
+    needed from Prophet's default initialization.
+    """
+    params = {name: model.params[name][0][0] for name in ('k', 'm', 'sigma_obs')}
+    for name in ('delta', 'beta'):
+        params[name] = model.params[name][0]
+    return params
+
+def forecast_model(model, years, frequency='daily'):
+    """
+    Predicts `years` years past the end of a trained model's history at the training frequency.
+
+    Returns:
+        pd.DataFrame: Forecast DataFrame.
+    """
+    freq, periods_per_year = FREQUENCIES[frequency]
+    future = model.make_future_dataframe(periods=years * periods_per_year, freq=freq)
 
     # Add carrying capacity to future dataframe for logistic growth
-    if growth == 'logistic':
-        future['cap'] = df['cap'].iloc[0]  # Use the same cap as in the historical data
+    if model.growth == 'logistic':
+        future['cap'] = model.history['cap'].iloc[0]  # Use the same cap as in the historical data
+
+    return model.predict(future)
+
+def predict_future_prices(df, years, **params):
+    """
+    Trains a Prophet model and makes predictions.
+
+    Args:
+        df (pd.DataFrame): DataFrame with 'ds' (datestamp) and 'y' (value) columns.
+        years (int): Number of years to predict into the future.
+        **params: Hyperparameters passed to fit_model.
+    
+    Returns:
+        Prophet: Trained Prophet model.
+        pd.DataFrame: Forecast DataFrame.
+    """
+    model = fit_model(df, **params)
+    return model, forecast_model(model, years, params.get('frequency', 'daily'))
 
-    forecast = model.predict(future)
-    return model, forecast
+def get_fitted_model(symbol, df, params=MODEL_PARAMS, lookback_years=None):
+    """
+    Returns a fitted model for `symbol`, reusing the model store when possible.
+
+    Models are keyed by ticker, training window and hyperparameters; a stored
+    fit is reused for any forecast horizon until a new bar arrives. When the
+    window has moved on, the refit is warm-started from the previous fit's
+    parameters; if they do not fit the new model's shape, it fits cold.
+    The lookback is part of the key, so fits on different lookbacks are
+    stored side by side instead of replacing each other.
+    """
+    key_params = {**params, 'lookback_years': lookback_years} if lookback_years else params
+    key = model_store.model_key(symbol, df, key_params)
+    model = model_store.load_model(key)
+    if model is not None:
+        print(f"Using cached model for {symbol}")
+        return model
+
+    previous = model_store.load_previous_model(key)
+    started = time.perf_counter()
+    model = None
+    if previous is not None:
+        try:
+            model = fit_model(df.copy(), init=stan_init(previous), **params)
+            print(f"Warm-started refit for {symbol} in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"Warm start failed for {symbol}, fitting from scratch: {e}")
+    if model is None:
+        model = fit_model(df, **params)
+        print(f"Fitted {symbol} in {time.perf_counter() - started:.2f}s")
+    try:
+        model_store.save_model(key, model)
+    except Exception as e:
+        print(f"Could not store model for {symbol}: {e}")
+    return model
 
-def plot_predictions(model, forecast, symbol, output_dir, historical_color='#0072B2', forecast_color='#D55E00', uncertainty_color='#009E73'):
+def plot_predictions(history, forecast, symbol, historical_color='#0072B2', forecast_color='#D55E00', uncertainty_color='#009E73'):
     """
     Plots the Prophet model's predictions with enhanced aesthetics.
 
+    The figure is rendered into memory, so concurrent requests never share a file.
+
     Args:
-        model (Prophet): Trained Prophet model.
+        history (pd.DataFrame): Training data ('ds'/'y'), e.g. model.history.
         forecast (pd.DataFrame): Forecast DataFrame.
         symbol (str): Stock symbol.
-        output_dir(str): The directory to save the images
         historical_color (str): Color for historical data.
         forecast_color (str): Color for forecasted data.
         uncertainty_color (str): Color for uncertainty intervals.
+
+    Returns:
+        bytes: PNG image.
     """
     fig = plt.figure(figsize=(12, 6))
     ax = fig.add_subplot(111)
 
     # Plot historical data
-    ax.plot(model.history['ds'], model.history['y'], color=historical_color, label='Historical', linewidth=2)
+    ax.plot(history['ds'], history['y'], color=historical_color, label='Historical', linewidth=2)
 
     # Plot forecasted data
     ax.plot(forecast['ds'], forecast['yhat'], color=forecast_color, label='Forecast', linewidth=2)
@@ -119,71 +280,271 @@ def plot_predictions(model, forecast, symbol, output_dir, historical_color='#007
     plt.xticks(rotation=45)
     plt.tight_layout()
 
-    image_path = os.path.join(output_dir, f"{symbol}_prediction.png")
-    plt.savefig(image_path)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
     plt.close(fig)
-    return image_path
+    return buffer.getvalue()
+
+def downsample_indices(n, max_points):
+    """Evenly spaced row indices (first and last included) selecting at most `max_points` of `n` rows."""
+    if max_points <= 0 or n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+
+def _encode_array(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
 
-def main(years):
+def forecast_series(forecast, history_end, max_points=FORECAST_MAX_POINTS, encoding='json'):
     """
-    Fetches stock data, trains Prophet models, makes predictions, and generates plots for multiple stocks.
+    Packs a forecast into compact columnar arrays for client-side charting.
+
+    Args:
+        forecast (pd.DataFrame): Forecast DataFrame (fitted history plus future).
+        history_end (pd.Timestamp): Last training date; later points are predictions.
+        max_points (int): Downsample to at most this many points (0 keeps all).
+        encoding (str): 'json' for ISO dates and rounded numbers, or 'binary' for
+            base64 little-endian arrays (ds as int32 days since 1970-01-01,
+            prices as float32).
+
+    Returns:
+        dict: ds, yhat, yhat_lower and yhat_upper arrays plus metadata.
+    """
+    rows = downsample_indices(len(forecast), max_points)
+    ds = forecast['ds'].to_numpy(dtype='datetime64[D]')[rows]
+    columns = {name: forecast[name].to_numpy(dtype=np.float64)[rows] for name in ('yhat', 'yhat_lower', 'yhat_upper')}
+    series = {
+        'encoding': encoding,
+        'points': len(rows),
+        'totalPoints': len(forecast),
+        'historyEnd': pd.Timestamp(history_end).strftime('%Y-%m-%d'),
+    }
+    if encoding == 'binary':
+        series['ds'] = _encode_array(ds.astype(np.int64), '<i4')
+        series.update({name: _encode_array(values, '<f4') for name, values in columns.items()})
+    else:
+        series['ds'] = np.datetime_as_string(ds, unit='D').tolist()
+        series.update({name: np.round(values, 4).tolist() for name, values in columns.items()})
+    return series
+
+def get_pool():
+    """Returns the shared process pool, started on first use and reused across requests."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, PROPHET_WORKERS),
+                mp_context=multiprocessing.get_context(PROPHET_START_METHOD)
+            )
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def forecast_ticker(symbol, df, years, frequency='daily', output='image', max_points=FORECAST_MAX_POINTS, encoding='json', lookback_years=None):
+    """
+    Fits (or loads a stored fit), predicts and plots one ticker. Runs inside a pool worker.
+
+    Args:
+        lookback_years (int): Lookback `df` was trimmed to, used to key the stored fit.
+        output (str): 'image' (base64 PNG), 'series' (forecast_series arrays) or 'both'.
+        max_points, encoding: Passed to forecast_series.
+
+    Returns:
+        dict: 'image' and/or 'series' for the ticker.
+    """
+    model = get_fitted_model(symbol, df, {**MODEL_PARAMS, 'frequency': frequency}, lookback_years)
+    forecast = forecast_model(model, years, frequency)
+    return render_result(symbol, model.history, forecast, output, max_points, encoding)
+
+def render_result(symbol, history, forecast, output='image', max_points=FORECAST_MAX_POINTS, encoding='json'):
+    """
+    Builds one ticker's response entry from its training data and forecast.
+
+    Returns:
+        dict: 'image' (base64 PNG) and/or 'series' (forecast_series arrays), per `output`.
     """
+    result = {}
+    if output in ('series', 'both'):
+        result['series'] = forecast_series(forecast, history['ds'].iloc[-1], max_points, encoding)
+    if output in ('image', 'both'):
+        # --- Enhanced Plotting ---
+        result['image'] = base64.b64encode(plot_predictions(history, forecast, symbol)).decode('utf-8')
+        print(f"Prediction plot rendered for {symbol}")
+    return result
+
+def collect_results(symbols, results, output='image'):
+    """
+    Arranges per-ticker forecast results for a response.
+
+    Args:
+        symbols (list): Ticker of every holding, in portfolio order (repeats allowed).
+        results (dict): symbol -> forecast_ticker result.
+        output (str): What was requested from forecast_ticker.
+
+    Returns:
+        dict: prophet_images (one per holding) for image output, and
+            forecasts (one per distinct ticker) for series output.
+    """
+    response = {}
+    finished = [symbol for symbol in symbols if symbol in results]
+    if output in ('image', 'both'):
+        response['prophet_images'] = [results[symbol]['image'] for symbol in finished]
+    if output in ('series', 'both'):
+        response['forecasts'] = [
+            {'tickerSymbol': symbol, **results[symbol]['series']} for symbol in dict.fromkeys(finished)
+        ]
+    return response
+
+def _run_forecasts(jobs, years, frequency='daily', on_result=None, engine='prophet', lookback_years=None, **options):
+    """
+    Runs forecast_ticker for every (symbol, df) job across the process pool.
+
+    The 'fast' engine forecasts every ticker in this process instead (see
+    fast_forecast); it needs no fitting, so the pool would only add overhead.
+
+    Args:
+        on_result: Optional callback(symbol, result, error) invoked as each ticker
+            finishes (result is None when it failed).
+        engine (str): 'prophet' (accurate) or 'fast'.
+        lookback_years (int): Lookback the jobs were trimmed to (keys the stored fits).
+        **options: output, max_points and encoding for forecast_ticker.
+
+    Returns:
+        dict: symbol -> forecast_ticker result (symbols that failed are left out)
+    """
+    results = {}
+    if not jobs:
+        return results
+
+    def finish(symbol, result=None, error=None):
+        if error is None:
+            results[symbol] = result
+        else:
+            print(f"Error processing {symbol}: {error}")
+        if on_result is not None:
+            on_result(symbol, result, error)
+
+    if engine == 'fast':
+        freq, periods_per_year = FREQUENCIES[frequency]
+        for symbol, forecast in fast_forecast.forecast_many(jobs, years, freq, periods_per_year).items():
+            if isinstance(forecast, Exception):
+                finish(symbol, error=forecast)
+                continue
+            try:
+                result = render_result(symbol, jobs[symbol], forecast, **options)
+            except Exception as e:
+                finish(symbol, error=e)
+                continue
+            finish(symbol, result)
+        return results
+
+    done = set()
     try:
-        abs_path = os.path.join(os.path.dirname(__file__), "../data/stocks.json")
-        if not os.path.exists(abs_path):
-            raise FileNotFoundError(f"File not found: {abs_path}")
-        with open(abs_path, 'r') as file:
-            stocks_data = json.load(file)
-    except FileNotFoundError:
-        print("Error: stocks.json file not found.")
-        return []
-
-    # Fetch as much historical data as possible
+        pool = get_pool()
+        futures = {pool.submit(forecast_ticker, symbol, df, years, frequency, lookback_years=lookback_years, **options): symbol for symbol, df in jobs.items()}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                done.add(symbol)
+                finish(symbol, error=e)
+                continue
+            done.add(symbol)
+            finish(symbol, result)
+    except BrokenProcessPool as e:
+        # A worker died (e.g. out of memory); finish the rest in this process
+        print(f"Prophet process pool failed, continuing sequentially: {e}")
+        _reset_pool()
+        for symbol, df in jobs.items():
+            if symbol in done:
+                continue
+            try:
+                result = forecast_ticker(symbol, df, years, frequency, lookback_years=lookback_years, **options)
+            except Exception as err:
+                finish(symbol, error=err)
+                continue
+            finish(symbol, result)
+    return results
+
+def load_training_data(symbols, lookback_years=None, frequency='daily'):
+    """
+    Reads price history for each symbol and prepares it for fitting.
+
+    History is synced into the bar store in one bulk call first; symbols with
+    no usable history are left out.
+
+    Returns:
+        dict: symbol -> 'ds'/'y' training DataFrame
+    """
+    # Fetch as much historical data as requested (all of it by default)
     end_date = pd.Timestamp.now().strftime('%Y-%m-%d')
     start_date = '1950-01-01' # YFinance can handle this far back
+    if lookback_years:
+        start_date = (pd.Timestamp.now().normalize() - pd.DateOffset(years=lookback_years, months=1)).strftime('%Y-%m-%d')
     
-    image_data_list = []
-    
-    output_dir = os.path.dirname(__file__)
+    try:
+        bar_store.sync_bars_many(symbols, "1d", start=start_date)
+    except Exception as e:
+        print(f"Bulk history sync failed, fetching tickers one by one: {e}")
 
-    for stock in stocks_data:
-        symbol = stock["tickerSymbol"]
+    jobs = {}
+    for symbol in symbols:
         print(f"Processing {symbol}...")
-
         try:
             df = fetch_stock_data(symbol, start_date, end_date)
-            if df is None:
-                print(f"Skipping {symbol} due to insufficient data.")
-                continue
-
-            # --- Model Tuning Parameters ---
-            # Experiment with these to potentially improve accuracy
-            seasonality_mode = 'multiplicative'  # Try 'additive' too
-            changepoint_prior_scale = 0.15 # Increased flexibility for trend changes, was 0.1
-            holidays_prior_scale = 15  # Increased impact of holidays, was 10      
-            seasonality_prior_scale = 15 # Increased impact of seasonality, was 10
-            growth = 'linear'  # Try 'logistic' if you expect saturation
-
-            model, forecast = predict_future_prices(
-                df, years, 
-                seasonality_mode=seasonality_mode,
-                changepoint_prior_scale=changepoint_prior_scale,
-                holidays_prior_scale=holidays_prior_scale,
-                seasonality_prior_scale=seasonality_prior_scale,
-                growth=growth
-            )
-
-            # --- Enhanced Plotting ---
-            image_path = plot_predictions(model, forecast, symbol, output_dir)
-            with open(image_path, 'rb') as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            image_data_list.append(image_data)
-            print(f"Prediction plot saved for {symbol}")
-
-            # Display the latest price
-            latest_price = df['y'].iloc[-1]
-            print(f"Latest {symbol} stock price: ${latest_price:.2f}")
-        
         except Exception as e:
             print(f"Error processing {symbol}: {e}")
-    return image_data_list
\ No newline at end of file
+            continue
+        if df is None:
+            print(f"Skipping {symbol} due to insufficient data.")
+            continue
+        # Display the latest price
+        latest_price = df['y'].iloc[-1]
+        print(f"Latest {symbol} stock price: ${latest_price:.2f}")
+        jobs[symbol] = prepare_training_data(df, lookback_years, frequency)
+    return jobs
+
+def portfolio_symbols(holdings):
+    """Distinct ticker symbols of a user's holdings, in portfolio order."""
+    return list(dict.fromkeys(stock["tickerSymbol"] for stock in holdings if stock.get("tickerSymbol")))
+
+def main(years, user_id=stocks_data.DEFAULT_USER_ID, lookback_years=None, frequency='daily', output='image', max_points=FORECAST_MAX_POINTS, encoding='json', engine='prophet'):
+    """
+    Fetches stock data, trains Prophet models, makes predictions, and generates plots for multiple stocks.
+    
+    Price history is read in this process (the bar store and Yahoo rate limiter
+    live here); fitting, prediction and plotting for each distinct ticker run in
+    parallel in a process pool. Results are returned in portfolio order.
+    
+    Args:
+        years (int): Forecast horizon in years.
+        user_id (str): Owner of the holdings to forecast.
+        lookback_years (int): Train on this many years of history (None = all available).
+        frequency (str): Train on 'daily', 'weekly' or 'monthly' closes.
+        output (str): 'image', 'series' or 'both' (see forecast_ticker).
+        max_points (int): Points per returned series (0 = no downsampling).
+        encoding (str): Series encoding, 'json' or 'binary' (see forecast_series).
+        engine (str): 'prophet' (accurate, seconds per ticker) or 'fast'
+            (log-linear drift with bootstrap bands, milliseconds per portfolio).
+
+    Returns:
+        dict: See collect_results.
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {frequency}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine: {engine}")
+    holdings = stocks_data.load_stocks_data(user_id)
+    jobs = load_training_data(portfolio_symbols(holdings), lookback_years, frequency)
+    results = _run_forecasts(
+        jobs, years, frequency, engine=engine, lookback_years=lookback_years,
+        output=output, max_points=max_points, encoding=encoding
+    )
+    return collect_results([stock["tickerSymbol"] for stock in holdings if stock.get("tickerSymbol")], results, output)
@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic import BaseModel
 
 class StockItem(BaseModel):
@@ -19,4 +20,10 @@ class ChatRequest(BaseModel):
     use_faiss: bool = False 
 
 class ProphetRequest(BaseModel):
-    years: int = 10  
\ No newline at end of file
+    years: int = 10
+    lookback_years: Optional[int] = None  # Train on this many years of history (None = all)
+    frequency: Literal['daily', 'weekly', 'monthly'] = 'daily'  # Resample closes before fitting
+    output: Literal['image', 'series', 'both'] = 'image'  # PNG plots and/or ds/yhat/yhat_lower/yhat_upper arrays
+    max_points: int = 500  # Downsample each returned series to at most this many points (0 = all)
+    encoding: Literal['json', 'binary'] = 'json'  # 'binary' = base64 int32 day numbers and float32 prices
+    engine: Literal['prophet', 'fast'] = 'prophet'  # 'fast' = log-linear drift with bootstrap bands  
\ No newline at end of file
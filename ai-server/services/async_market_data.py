@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+from services.stocks_data import (
+    MAX_FETCH_WORKERS,
+    empty_quote,
+    fetch_bulk_quotes,
+    fetch_quote_once,
+    get_cached_quote,
+    is_rate_limited,
+    record_failure,
+    retry_delay,
+)
+
+load_dotenv()
+
+STOCKS_REQUEST_TIMEOUT = float(os.getenv("STOCKS_REQUEST_TIMEOUT", "20"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "50"))
+MAX_BULK_DOWNLOADS = int(os.getenv("MAX_BULK_DOWNLOADS", "2"))
+
+
+async def fetch_stock_data_async(ticker, max_retries=3):
+    """
+    Fetches one ticker's quote with caching and rate-limit retries.
+
+    The blocking yfinance / bar store work runs in a worker thread and the
+    retry backoff awaits instead of sleeping, so other requests keep being
+    served while this ticker waits.
+
+    Args:
+        ticker: Stock ticker symbol
+        max_retries: Maximum number of retry attempts
+
+    Returns:
+        Dictionary with current price and dividend yield
+    """
+    cached = get_cached_quote(ticker)
+    if cached is not None:
+        return cached
+
+    for retry_count in range(1, max_retries + 1):
+        try:
+            return await asyncio.to_thread(fetch_quote_once, ticker)
+        except Exception as e:
+            if not is_rate_limited(e):
+                print(f"Error fetching data for {ticker}: {e}")
+                record_failure(ticker)
+                return empty_quote()
+            if retry_count >= max_retries:
+                print(f"Error fetching data for {ticker} after {max_retries} retries: {e}")
+                record_failure(ticker)
+                return empty_quote()
+            delay = retry_delay(retry_count)
+            print(f"Rate limited for {ticker}. Retrying in {delay:.2f} seconds (attempt {retry_count}/{max_retries})")
+            await asyncio.sleep(delay)
+    return empty_quote()
+
+
+async def iter_stocks_async(tickers, timeout=STOCKS_REQUEST_TIMEOUT, max_concurrency=MAX_FETCH_WORKERS, bulk_chunk_size=BULK_CHUNK_SIZE):
+    """
+    Yields (ticker, stock data) pairs as soon as each quote resolves.
+
+    Cached tickers are yielded immediately. The rest are split into chunks
+    that are bulk-downloaded concurrently, and tickers a chunk could not
+    resolve fall back to bounded per-ticker fetches. Iteration stops at the
+    deadline; tickers that were not yielded by then should be reported as failed.
+
+    Args:
+        tickers: List of ticker symbols (duplicates are fetched once)
+        timeout: Per-request deadline in seconds (None waits for everything)
+        max_concurrency: Maximum number of per-ticker fetches in flight
+        bulk_chunk_size: Tickers per bulk download
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def remaining():
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    pending = []
+    for ticker in dict.fromkeys(tickers):
+        cached = get_cached_quote(ticker)
+        if cached is not None:
+            yield ticker, cached
+        else:
+            pending.append(ticker)
+
+    if not pending:
+        return
+
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    bulk_semaphore = asyncio.Semaphore(MAX_BULK_DOWNLOADS)
+
+    async def fetch_one(ticker):
+        # Always queue a row, so the consumer never waits on a ticker whose fetch died
+        try:
+            async with semaphore:
+                data = await fetch_stock_data_async(ticker)
+        except Exception as e:
+            print(f"Error fetching data for {ticker}: {e}")
+            data = empty_quote()
+        await queue.put((ticker, data))
+
+    async def fetch_chunk(chunk):
+        found = {}
+        if len(chunk) > 1:
+            try:
+                async with bulk_semaphore:
+                    found = await asyncio.to_thread(fetch_bulk_quotes, chunk)
+            except Exception as e:
+                # e.g. a bar store write error; fall back to per-ticker fetches for the whole chunk
+                print(f"Bulk quote fetch failed for {len(chunk)} tickers, fetching one by one: {e}")
+                found = {}
+            for ticker in chunk:
+                if ticker in found:
+                    await queue.put((ticker, found[ticker]))
+        await asyncio.gather(*(fetch_one(ticker) for ticker in chunk if ticker not in found))
+
+    chunk_size = max(1, bulk_chunk_size)
+    tasks = [
+        asyncio.create_task(fetch_chunk(pending[i:i + chunk_size]))
+        for i in range(0, len(pending), chunk_size)
+    ]
+    outstanding = len(pending)
+    try:
+        while outstanding:
+            try:
+                ticker, data = await asyncio.wait_for(queue.get(), remaining())
+            except asyncio.TimeoutError:
+                print(f"Deadline reached with {outstanding} tickers still pending")
+                return
+            outstanding -= 1
+            yield ticker, data
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def fetch_stocks_async(tickers, timeout=STOCKS_REQUEST_TIMEOUT, max_concurrency=MAX_FETCH_WORKERS):
+    """
+    Fetches quotes for many tickers without blocking the event loop.
+
+    Cached tickers are answered immediately, the rest go through bulk
+    downloads and then bounded concurrent per-ticker fetches. Whatever has not
+    resolved when `timeout` seconds have passed is left out of the result, so
+    callers can return partial data and report the missing tickers.
+
+    Args:
+        tickers: List of ticker symbols (duplicates are fetched once)
+        timeout: Per-request deadline in seconds (None waits for everything)
+        max_concurrency: Maximum number of per-ticker fetches in flight
+
+    Returns:
+        Dictionary of ticker to stock data for the tickers resolved in time
+    """
+    results = {}
+    async for ticker, data in iter_stocks_async(tickers, timeout=timeout, max_concurrency=max_concurrency):
+        results[ticker] = data
+    return results
@@ -0,0 +1,318 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from services.market_data_provider import get_provider
+from services.rate_limiter import yahoo_call
+
+load_dotenv()
+
+BAR_STORE_PATH = os.getenv("BAR_STORE_PATH", "./database/market_bars.db")
+BAR_REFRESH_INTERVAL = timedelta(minutes=int(os.getenv("BAR_REFRESH_MINUTES", "15")))
+
+SUPPORTED_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume", "Dividends", "Stock Splits"]
+_DB_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume", "dividends", "stock_splits"]
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect():
+    """Opens a connection to the bar store, creating the schema on first use."""
+    global _initialized
+    if not _initialized:
+        os.makedirs(os.path.dirname(BAR_STORE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(BAR_STORE_PATH, timeout=30)
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bars (
+                        ticker TEXT NOT NULL,
+                        interval TEXT NOT NULL,
+                        ts TEXT NOT NULL,
+                        open REAL, high REAL, low REAL, close REAL, adj_close REAL,
+                        volume REAL, dividends REAL, stock_splits REAL,
+                        PRIMARY KEY (ticker, interval, ts)
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bar_coverage (
+                        ticker TEXT NOT NULL,
+                        interval TEXT NOT NULL,
+                        covered_from TEXT,
+                        last_ts TEXT,
+                        fetched_at TEXT,
+                        PRIMARY KEY (ticker, interval)
+                    )
+                ''')
+                conn.commit()
+                _initialized = True
+    return conn
+
+
+def period_start(period, now=None):
+    """
+    Converts a Yahoo-style period string ("5d", "6mo", "1y", "ytd", "max") into a start date.
+
+    Returns:
+        pd.Timestamp, or None for "max".
+    """
+    now = pd.Timestamp(now or datetime.now()).normalize()
+    if period is None or period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    for suffix, offset in (("mo", "months"), ("wk", "weeks"), ("d", "days"), ("y", "years")):
+        if period.endswith(suffix):
+            amount = int(period[:-len(suffix)])
+            return now - pd.DateOffset(**{offset: amount})
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def _to_rows(ticker, interval, df):
+    """Turns a yfinance OHLCV frame into rows for the bars table."""
+    if df is None or df.empty:
+        return []
+    idx = pd.DatetimeIndex(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    frame = df.reindex(columns=BAR_COLUMNS)
+    frame.index = idx.strftime("%Y-%m-%d")
+    frame = frame[frame["Close"].notna()]
+    values = frame.astype(float).itertuples(name=None)
+    return [(ticker, interval, ts, *row) for ts, *row in values]
+
+
+def _write_bars(conn, ticker, interval, df, covered_from=None, replace=False):
+    """
+    Upserts fetched bars and advances the coverage record for the series.
+
+    `covered_from` is the earliest date the stored series is known to be
+    complete from; an empty string means the full available history.
+    """
+    rows = _to_rows(ticker, interval, df)
+    if replace:
+        conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval))
+    if rows:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO bars (ticker, interval, ts, {', '.join(_DB_COLUMNS)}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(_DB_COLUMNS))})",
+            rows
+        )
+    last_ts = conn.execute(
+        "SELECT MAX(ts) FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval)
+    ).fetchone()[0]
+    previous = conn.execute(
+        "SELECT covered_from FROM bar_coverage WHERE ticker = ? AND interval = ?", (ticker, interval)
+    ).fetchone()
+    if previous and not replace:
+        covered_from = previous[0] if covered_from is None else min(previous[0], covered_from)
+    conn.execute(
+        "INSERT OR REPLACE INTO bar_coverage (ticker, interval, covered_from, last_ts, fetched_at) VALUES (?, ?, ?, ?, ?)",
+        (ticker, interval, covered_from if covered_from is not None else "", last_ts, datetime.now().isoformat())
+    )
+    conn.commit()
+
+
+def _coverage(conn, ticker, interval):
+    row = conn.execute(
+        "SELECT covered_from, last_ts, fetched_at FROM bar_coverage WHERE ticker = ? AND interval = ?",
+        (ticker, interval)
+    ).fetchone()
+    if row is None or row[1] is None:
+        return None
+    return {"covered_from": row[0], "last_ts": row[1], "fetched_at": datetime.fromisoformat(row[2])}
+
+
+def _fetch_history(ticker, interval, start=None, end=None):
+    """Downloads one ticker's bars from the market data provider through the shared rate limiter."""
+    return yahoo_call(get_provider().history, ticker, start=start, end=end, interval=interval)
+
+
+def _has_new_split(df, last_ts):
+    if df is None or df.empty or "Stock Splits" not in df:
+        return False
+    splits = df["Stock Splits"].fillna(0)
+    idx = pd.DatetimeIndex(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return bool(((splits.values != 0) & (idx > pd.Timestamp(last_ts))).any())
+
+
+def _needs_tail(coverage, now, max_age=BAR_REFRESH_INTERVAL):
+    return now - coverage["fetched_at"] >= max_age
+
+
+def _needs_head(coverage, start_str):
+    return start_str < coverage["covered_from"]
+
+
+def sync_bars(ticker, interval="1d", start=None, max_age=BAR_REFRESH_INTERVAL):
+    """
+    Brings the stored series up to date, fetching only the bars that are missing.
+
+    A series seen for the first time is downloaded from `start` (or its full
+    history when `start` is None). Afterwards only the tail since the last
+    stored bar is re-downloaded once per `max_age` (BAR_REFRESH_INTERVAL by
+    default; live pollers pass a shorter one), and the head is
+    extended only when a caller asks for an earlier start than ever before.
+    Because Yahoo closes are split-adjusted, a split inside the new tail
+    triggers a full re-download of the series.
+
+    Raises whatever yfinance raises when nothing is stored yet; with stored
+    bars available, fetch errors are logged and the stored series is kept.
+    """
+    if interval not in SUPPORTED_INTERVALS:
+        raise ValueError(f"Unsupported interval for bar store: {interval}")
+    start = pd.Timestamp(start).normalize() if start is not None else None
+    now = datetime.now()
+
+    conn = _connect()
+    try:
+        coverage = _coverage(conn, ticker, interval)
+        start_str = start.strftime("%Y-%m-%d") if start is not None else ""
+
+        if coverage is None:
+            df = _fetch_history(ticker, interval, start=start)
+            _write_bars(conn, ticker, interval, df, covered_from=start_str, replace=True)
+            return
+
+        try:
+            if _needs_head(coverage, start_str):
+                end = coverage["covered_from"] if start is not None else None
+                head = _fetch_history(ticker, interval, start=start, end=end)
+                _write_bars(conn, ticker, interval, head, covered_from=start_str)
+                coverage = _coverage(conn, ticker, interval)
+
+            if _needs_tail(coverage, now, max_age):
+                tail = _fetch_history(ticker, interval, start=coverage["last_ts"])
+                if _has_new_split(tail, coverage["last_ts"]):
+                    print(f"Split detected for {ticker}, reloading stored {interval} bars")
+                    covered_from = coverage["covered_from"] or None
+                    full = _fetch_history(ticker, interval, start=covered_from)
+                    _write_bars(conn, ticker, interval, full, covered_from=coverage["covered_from"], replace=True)
+                else:
+                    _write_bars(conn, ticker, interval, tail)
+        except Exception as e:
+            print(f"Could not refresh stored bars for {ticker} ({interval}), serving stored data: {e}")
+    finally:
+        conn.close()
+
+
+def sync_bars_many(tickers, interval="1d", start=None):
+    """
+    Refreshes many series with at most two multi-ticker Yahoo downloads.
+
+    Unseen tickers are downloaded together from `start`, and stale tickers
+    share one download starting at the oldest of their last stored bars.
+    Tickers the bulk calls could not resolve (a group of one, a head
+    extension, a new split, a failed or partial download) are left for `sync_bars`.
+
+    Returns:
+        set: Tickers whose stored series is up to date after the call, either
+            refreshed by a bulk download or refreshed recently enough already.
+    """
+    start = pd.Timestamp(start).normalize() if start is not None else None
+    now = datetime.now()
+    start_str = start.strftime("%Y-%m-%d") if start is not None else ""
+
+    conn = _connect()
+    try:
+        fresh, stale, synced = [], {}, set()
+        for ticker in dict.fromkeys(tickers):
+            coverage = _coverage(conn, ticker, interval)
+            if coverage is None:
+                fresh.append(ticker)
+            elif _needs_head(coverage, start_str):
+                continue
+            elif _needs_tail(coverage, now):
+                stale[ticker] = coverage["last_ts"]
+            else:
+                synced.add(ticker)
+
+        groups = []
+        if fresh:
+            groups.append((fresh, start, True))
+        if stale:
+            groups.append((list(stale), pd.Timestamp(min(stale.values())), False))
+
+        for group, group_start, is_new in groups:
+            if len(group) < 2:
+                continue
+            try:
+                data = yahoo_call(get_provider().download, group, start=group_start, interval=interval)
+            except Exception as e:
+                print(f"Bulk bar download failed for {len(group)} tickers: {e}")
+                continue
+            if data is None or data.empty or not isinstance(data.columns, pd.MultiIndex):
+                continue
+            available = set(data.columns.get_level_values(0))
+            for ticker in group:
+                if ticker not in available:
+                    continue
+                df = data[ticker].dropna(how="all")
+                if df.empty:
+                    continue
+                if is_new:
+                    _write_bars(conn, ticker, interval, df, covered_from=start_str, replace=True)
+                elif not _has_new_split(df, stale[ticker]):
+                    _write_bars(conn, ticker, interval, df)
+                else:
+                    continue
+                synced.add(ticker)
+    finally:
+        conn.close()
+    return synced
+
+
+def read_bars(ticker, interval="1d", start=None, end=None):
+    """
+    Reads stored bars without touching the network.
+
+    Returns:
+        pd.DataFrame indexed by a tz-naive 'Date' with the yfinance column names
+        (Open, High, Low, Close, Adj Close, Volume, Dividends, Stock Splits).
+    """
+    query = f"SELECT ts, {', '.join(_DB_COLUMNS)} FROM bars WHERE ticker = ? AND interval = ?"
+    params = [ticker, interval]
+    if start is not None:
+        query += " AND ts >= ?"
+        params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        query += " AND ts < ?"
+        params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+    query += " ORDER BY ts"
+
+    conn = _connect()
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    df.columns = ["Date"] + BAR_COLUMNS
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df.set_index("Date")
+
+
+def get_bars(ticker, interval="1d", start=None, end=None):
+    """
+    Returns bars for `ticker`, syncing the missing tail from Yahoo first.
+
+    Args:
+        ticker: Stock ticker symbol
+        interval: Bar interval ("1d", "1wk", "1mo", ...)
+        start: Earliest bar wanted (None for full history)
+        end: Exclusive upper bound on bar dates (None for latest)
+
+    Returns:
+        pd.DataFrame as described in `read_bars`.
+    """
+    sync_bars(ticker, interval, start=start)
+    return read_bars(ticker, interval, start=start, end=end)
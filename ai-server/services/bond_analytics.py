@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_COUPON_FREQUENCY = 2
+_FREQUENCIES = (1, 2, 4, 12)
+
+
+def _add_months(months, days, offset):
+    """Shifts month-resolution dates by `offset` months, clipping the day to the target month's length."""
+    target = months - offset.astype("timedelta64[M]")
+    first = target.astype("datetime64[D]")
+    month_length = ((target + np.timedelta64(1, "M")).astype("datetime64[D]") - first).astype(np.int64)
+    return first + np.minimum(days, month_length - 1).astype("timedelta64[D]")
+
+
+def price_bonds(face, coupon_rate, maturity, ytm, frequency=DEFAULT_COUPON_FREQUENCY, settlement=None):
+    """
+    Prices a book of fixed-coupon bonds in one vectorized pass.
+
+    Coupon dates are rolled back from maturity in steps of 12 / frequency
+    months. Accrued interest uses actual/actual days within the current coupon
+    period. Every remaining cash flow is discounted at the periodic yield
+    (ytm / frequency) over fractional periods, using one padded
+    bonds-by-periods matrix.
+
+    Args:
+        face: Face values (principal)
+        coupon_rate: Annual coupon rates in percent (6.5 means 6.5%)
+        maturity: Maturity dates (anything np.datetime64 accepts)
+        ytm: Annual yields to maturity in percent; NaN prices at the coupon rate (par)
+        frequency: Coupon payments per year (1, 2, 4 or 12), scalar or per bond
+        settlement: Valuation date (defaults to today)
+
+    Returns:
+        Dictionary of arrays: cleanPrice and dirtyPrice (per 100 face),
+        accruedInterest and marketValue (currency amounts),
+        macaulayDuration and modifiedDuration (years), convexity (years^2),
+        nextCouponDate, remainingCoupons and matured.
+    """
+    face = np.asarray(face, dtype=np.float64)
+    n_bonds = face.size
+    coupon = np.nan_to_num(np.asarray(coupon_rate, dtype=np.float64)) / 100
+    ytm = np.asarray(ytm, dtype=np.float64) / 100
+    ytm = np.where(np.isnan(ytm), coupon, ytm)
+    frequency = np.broadcast_to(np.asarray(frequency, dtype=np.int64), face.shape)
+    frequency = np.where(np.isin(frequency, _FREQUENCIES), frequency, DEFAULT_COUPON_FREQUENCY)
+
+    settle = np.datetime64(pd.Timestamp(settlement or pd.Timestamp.now()).date(), "D")
+    maturity = np.asarray(maturity, dtype="datetime64[D]")
+    matured = maturity <= settle
+
+    # Largest whole-month offset from maturity that still lands after settlement
+    maturity_month = maturity.astype("datetime64[M]")
+    maturity_day = (maturity - maturity_month.astype("datetime64[D]")).astype(np.int64)
+    settle_month = settle.astype("datetime64[M]")
+    settle_day = (settle - settle_month.astype("datetime64[D]")).astype(np.int64)
+    month_gap = (maturity_month - settle_month).astype(np.int64) - (maturity_day <= settle_day)
+
+    step = 12 // frequency
+    remaining = np.where(matured, 0, month_gap // step + 1)
+    next_coupon = _add_months(maturity_month, maturity_day, (remaining - 1) * step)
+    previous_coupon = _add_months(maturity_month, maturity_day, remaining * step)
+    period_days = (next_coupon - previous_coupon).astype(np.int64)
+    accrued_fraction = np.where(matured, 0.0, (settle - previous_coupon).astype(np.int64) / np.maximum(period_days, 1))
+
+    periodic_coupon = coupon / frequency * 100
+    periodic_yield = ytm / frequency
+
+    max_periods = int(remaining.max()) if n_bonds else 0
+    k = np.arange(1, max_periods + 1)
+    live = k[None, :] <= remaining[:, None]
+    t = (k[None, :] - accrued_fraction[:, None])
+    cash_flows = np.where(live, periodic_coupon[:, None], 0.0)
+    # Principal is repaid with the last coupon; matured bonds have no cash flows left
+    outstanding = np.flatnonzero(~matured)
+    cash_flows[outstanding, remaining[outstanding] - 1] += 100.0
+    discount = (1 + periodic_yield[:, None]) ** -t
+    present_values = cash_flows * discount
+
+    dirty = present_values.sum(axis=1)
+    accrued = periodic_coupon * accrued_fraction
+    with np.errstate(invalid="ignore", divide="ignore"):
+        macaulay_periods = (present_values * t).sum(axis=1) / dirty
+        convexity_periods = (present_values * t * (t + 1)).sum(axis=1) / dirty / (1 + periodic_yield) ** 2
+    macaulay = macaulay_periods / frequency
+    modified = macaulay / (1 + periodic_yield)
+    convexity = convexity_periods / frequency ** 2
+
+    # Matured bonds are carried at face value until they are removed from the book
+    dirty = np.where(matured, 100.0, dirty)
+    clean = dirty - accrued
+    return {
+        "cleanPrice": clean,
+        "dirtyPrice": dirty,
+        "accruedInterest": accrued * face / 100,
+        "marketValue": dirty * face / 100,
+        "macaulayDuration": np.where(matured, 0.0, macaulay),
+        "modifiedDuration": np.where(matured, 0.0, modified),
+        "convexity": np.where(matured, 0.0, convexity),
+        "nextCouponDate": np.where(matured, np.datetime64("NaT"), next_coupon),
+        "remainingCoupons": remaining,
+        "matured": matured,
+    }
+
+
+def analyze_bonds(bonds, settlement=None):
+    """
+    Runs price_bonds over stored bond records.
+
+    Records without a usable principal or maturity date cannot be priced and
+    fall back to face value with no risk measures (`priced` is False).
+
+    Args:
+        bonds: List of bond records (principal, couponRate, maturityDate,
+            yieldToMaturity and optional couponFrequency)
+        settlement: Valuation date (defaults to today)
+
+    Returns:
+        pd.DataFrame with one row per bond, in input order.
+    """
+    columns = ["cleanPrice", "dirtyPrice", "accruedInterest", "marketValue", "macaulayDuration",
+               "modifiedDuration", "convexity", "nextCouponDate", "remainingCoupons", "matured"]
+    if not bonds:
+        return pd.DataFrame(columns=columns + ["priced"])
+
+    frame = pd.DataFrame({
+        "principal": pd.to_numeric(pd.Series([b.get("principal") for b in bonds]), errors="coerce"),
+        "couponRate": pd.to_numeric(pd.Series([b.get("couponRate") for b in bonds]), errors="coerce"),
+        "yieldToMaturity": pd.to_numeric(pd.Series([b.get("yieldToMaturity") for b in bonds]), errors="coerce"),
+        "maturityDate": pd.to_datetime(pd.Series([b.get("maturityDate") for b in bonds]), errors="coerce"),
+        "couponFrequency": pd.to_numeric(pd.Series([b.get("couponFrequency") for b in bonds]), errors="coerce"),
+    })
+    priceable = frame["principal"].notna() & frame["maturityDate"].notna()
+
+    n_bonds = len(frame)
+    mask = priceable.to_numpy()
+    result = {column: np.full(n_bonds, np.nan) for column in columns}
+    result["nextCouponDate"] = np.full(n_bonds, np.datetime64("NaT"), dtype="datetime64[D]")
+    result["matured"] = np.zeros(n_bonds, dtype=bool)
+    result["marketValue"] = frame["principal"].fillna(0.0).to_numpy(dtype=np.float64, copy=True)
+    if mask.any():
+        subset = frame[priceable]
+        priced = price_bonds(
+            subset["principal"].to_numpy(dtype=np.float64),
+            subset["couponRate"].to_numpy(dtype=np.float64),
+            subset["maturityDate"].to_numpy(dtype="datetime64[D]"),
+            subset["yieldToMaturity"].to_numpy(dtype=np.float64),
+            subset["couponFrequency"].fillna(DEFAULT_COUPON_FREQUENCY).to_numpy(dtype=np.int64),
+            settlement,
+        )
+        for column in columns:
+            result[column][mask] = priced[column]
+    result = pd.DataFrame(result, columns=columns)
+    result["priced"] = mask
+    return result
+
+
+def bond_market_values(bonds, settlement=None):
+    """Returns the dirty market value of each bond record as a NumPy array."""
+    return analyze_bonds(bonds, settlement)["marketValue"].to_numpy(dtype=np.float64)
+
+
+def bond_records(analytics):
+    """Serializes analyze_bonds output to JSON-friendly records (rounded, dates as ISO strings)."""
+    frame = analytics.copy()
+    for column in ("cleanPrice", "dirtyPrice", "macaulayDuration", "modifiedDuration", "convexity"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").round(4)
+    for column in ("accruedInterest", "marketValue"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").round(2)
+    frame["nextCouponDate"] = pd.to_datetime(frame["nextCouponDate"], errors="coerce").dt.strftime("%Y-%m-%d")
+    frame["remainingCoupons"] = frame["remainingCoupons"].astype("Int64")
+    frame = frame.astype(object)
+    return frame.where(pd.notna(frame), None).to_dict(orient="records")
@@ -0,0 +1,224 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory" keeps every cache per process; "sqlite" shares entries between uvicorn workers.
+# A single namespace can opt in or out with CACHE_BACKEND_<NAMESPACE>, e.g. CACHE_BACKEND_QUOTES=sqlite
+# (dots in module-scoped namespaces become underscores: CACHE_BACKEND_FINGRAPH_HISTORICAL_PRICES).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./database/shared_cache.db")
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Per-process backend: a dict of (value, expires_at) guarded by a lock."""
+
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self, prefix=""):
+        now = time.time()
+        with self._lock:
+            return [k for k, (_, exp) in self._data.items() if k.startswith(prefix) and (exp is None or exp > now)]
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SQLiteBackend:
+    """
+    Backend shared by every process on the host through one SQLite file in WAL mode.
+
+    Values are pickled, so anything the in-memory caches hold today can be stored.
+    """
+
+    shared = True
+
+    def __init__(self, path=CACHE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL
+            )
+        ''')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl if ttl else None)
+        )
+        self._writes += 1
+        if self._writes % 256 == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        conn.commit()
+
+    def keys(self, prefix=""):
+        rows = self._conn().execute(
+            "SELECT key FROM cache_entries WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\uffff", time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, prefix=""):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+        conn.commit()
+
+
+_BACKEND_TYPES = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def backend_name_for(namespace):
+    return os.getenv(f"CACHE_BACKEND_{namespace.upper().replace('.', '_')}", CACHE_BACKEND)
+
+
+def get_backend(namespace):
+    """Returns the backend configured for `namespace` (backends are shared by name)."""
+    name = backend_name_for(namespace)
+    if name not in _BACKEND_TYPES:
+        raise ValueError(f"Unknown cache backend '{name}' for namespace '{namespace}'")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = _BACKEND_TYPES[name]()
+        return _backends[name]
+
+
+class NamespacedCache(MutableMapping):
+    """
+    Dict-like view of one namespace in a cache backend.
+
+    Values read from a shared backend are copies, so code that mutates a
+    cached value in place must assign it back for other workers to see it.
+    """
+
+    def __init__(self, namespace, ttl=None, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.backend = backend or get_backend(namespace)
+        self._prefix = f"{namespace}:"
+
+    def __getitem__(self, key):
+        value = self.backend.get(self._prefix + key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backend.set(self._prefix + key, value, self.ttl)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.backend.delete(self._prefix + key)
+
+    def __contains__(self, key):
+        return self.backend.get(self._prefix + key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter([k[len(self._prefix):] for k in self.backend.keys(self._prefix)])
+
+    def __len__(self):
+        return len(self.backend.keys(self._prefix))
+
+    def clear(self):
+        self.backend.clear(self._prefix)
+
+
+def get_shared_backend(namespace):
+    """Returns the backend for `namespace` if it is shared between processes, otherwise None."""
+    backend = get_backend(namespace)
+    return backend if backend.shared else None
+
+
+def get_cache(namespace, ttl=None):
+    """Returns a dict-like cache for `namespace` on its configured backend."""
+    return NamespacedCache(namespace, ttl=ttl)
+
+
+def cached(namespace, ttl=None):
+    """
+    Memoizes a function in the `namespace` cache, keyed by its arguments.
+
+    Drop-in replacement for functools.lru_cache on functions whose results
+    should be shared between workers when the namespace uses a shared backend.
+    """
+    def decorator(fn):
+        store = get_cache(namespace, ttl=ttl)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = repr((args, sorted(kwargs.items())))
+            value = store.get(key, _MISSING)
+            if value is _MISSING:
+                value = fn(*args, **kwargs)
+                store[key] = value
+            return value
+
+        wrapper.cache_clear = store.clear
+        return wrapper
+    return decorator
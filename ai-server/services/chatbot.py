@@ -9,15 +9,20 @@ from datetime import datetime, timedelta
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 from groq import Groq
-import yfinance as yf
 import pandas as pd
 import json
-from functools import lru_cache
+from services.cache_backend import cached, get_cache
 import atexit
 from pydantic import BaseModel
+from services import bar_store
+from services.rate_limiter import yahoo_call
+from services.market_data_provider import get_provider
 
 load_dotenv()
 
+FINANCIALS_CACHE_TTL = int(os.getenv("FINANCIALS_CACHE_TTL", "86400"))
+HISTORICAL_CACHE_TTL = int(os.getenv("HISTORICAL_CACHE_TTL", "900"))
+
 path2 = '/home/sameer42/Desktop/Hackathons/fin360/ai-server' 
 annual_reports = 'Annual Reports'
 
@@ -58,7 +63,7 @@ state = {
         {"role": "assistant", "content": "Welcome to FinGraph RAG! Ask about documents or financial analysis.", "feedback": None}
     ],
     "conversation_context": [],
-    "financial_cache": {},
+    "financial_cache": get_cache("financial_cache", ttl=FINANCIALS_CACHE_TTL),
     "graph_initialized": False
 }
 
@@ -87,7 +92,7 @@ def initialize_graph_database():
     for sector, tickers in SECTORS.items():
         for ticker in tickers:
             try:
-                company_info = yf.Ticker(ticker).info
+                company_info = yahoo_call(get_provider().info, ticker)
                 company_data = {
                     "ticker": ticker,
                     "name": company_info.get("shortName", ticker),
@@ -135,8 +140,6 @@ def initialize_graph_database():
                         WHERE c2.ticker <> $ticker AND (c1)-[:BELONGS_TO]->(:Sector)<-[:BELONGS_TO]-(c2)
                         MERGE (c1)-[:COMPETES_WITH]->(c2)
                     """, {"ticker": ticker})
-
-                time.sleep(0.5)
             except Exception as e:
                 print(f"Error processing {ticker}: {str(e)}")
                 continue
@@ -144,14 +147,15 @@ def initialize_graph_database():
     state['graph_initialized'] = True
     return {"message": "Graph database initialized!"}
 
-@lru_cache(maxsize=100)
+@cached("chatbot.company_financials", ttl=FINANCIALS_CACHE_TTL)
 def fetch_company_financials(ticker):
     try:
-        company = yf.Ticker(ticker)
-        income_stmt = company.income_stmt
-        balance_sheet = company.balance_sheet
-        cash_flow = company.cashflow
-        info = company.info
+        provider = get_provider()
+        statements = yahoo_call(provider.statements, ticker)
+        income_stmt = statements["income_stmt"]
+        balance_sheet = statements["balance_sheet"]
+        cash_flow = statements["cashflow"]
+        info = yahoo_call(provider.info, ticker)
         financials = {}
         if not income_stmt.empty and "Total Revenue" in income_stmt.index:
             financials["Revenue"] = float(income_stmt.loc["Total Revenue"].iloc[0])
@@ -193,17 +197,13 @@ def fetch_company_financials(ticker):
         print(f"Error fetching financials for {ticker}: {str(e)}")
         return {}
 
-@lru_cache(maxsize=50)
+@cached("chatbot.historical_prices", ttl=HISTORICAL_CACHE_TTL)
 def fetch_historical_data(ticker, period="1y", interval="1mo"):
     try:
-        data = yf.download(ticker, period=period, interval=interval, progress=False)
+        data = bar_store.get_bars(ticker, interval, start=bar_store.period_start(period))
         if data.empty:
             return {}
-        historical_prices = {}
-        for date, row in data.iterrows():
-            date_str = date.strftime("%Y-%m-%d")
-            historical_prices[date_str] = float(row["Close"].iloc[0])
-        return historical_prices
+        return {date.strftime("%Y-%m-%d"): float(close) for date, close in data["Close"].items()}
     except Exception as e:
         print(f"Error fetching historical data for {ticker}: {str(e)}")
         return {}
@@ -372,8 +372,8 @@ def init_state():
         ]
     if not state['conversation_context']:
         state['conversation_context'] = []
-    if not state['financial_cache']:
-        state['financial_cache'] = {}
+    if state['financial_cache'] is None:
+        state['financial_cache'] = get_cache("financial_cache", ttl=FINANCIALS_CACHE_TTL)
     if not state['graph_initialized']:
         state['graph_initialized'] = False
 
@@ -3,19 +3,28 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from groq import Groq
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import json
 from datetime import datetime, timedelta
 import time
-from functools import lru_cache
+import sys
 import matplotlib.pyplot as plt
 from io import BytesIO
 
+# Streamlit runs this file as a script, so make the ai-server package root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import bar_store
+from services.cache_backend import cached
+from services.rate_limiter import yahoo_call
+from services.market_data_provider import get_provider
+
 # Load environment variables
 load_dotenv()
 
+FINANCIALS_CACHE_TTL = int(os.getenv("FINANCIALS_CACHE_TTL", "86400"))
+HISTORICAL_CACHE_TTL = int(os.getenv("HISTORICAL_CACHE_TTL", "900"))
+
 # Initialize Neo4j driver
 neo4j_uri='neo4j+s://3cc9d5ce.databases.neo4j.io'
 neo4j_username='neo4j'
@@ -163,7 +172,7 @@ def initialize_graph_database():
             for ticker in tickers:
                 try:
                     # Fetch company info
-                    company_info = yf.Ticker(ticker).info
+                    company_info = yahoo_call(get_provider().info, ticker)
                     
                     # Extract relevant company data
                     company_data = {
@@ -241,8 +250,6 @@ def initialize_graph_database():
                         AND (c1)-[:BELONGS_TO]->(:Sector)<-[:BELONGS_TO]-(c2)
                         MERGE (c1)-[:COMPETES_WITH]->(c2)
                         """, {"ticker": ticker})
-                    
-                    time.sleep(0.5)  # Avoid rate limiting
                 
                 except Exception as e:
                     st.warning(f"Error processing {ticker}: {str(e)}")
@@ -251,23 +258,20 @@ def initialize_graph_database():
     st.session_state.graph_initialized = True
     st.success("Graph database initialized with financial data!")
 
-@lru_cache(maxsize=100)
+@cached("fingraph.company_financials", ttl=FINANCIALS_CACHE_TTL)
 def fetch_company_financials(ticker):
     """Fetch key financial metrics for a company"""
     try:
-        company = yf.Ticker(ticker)
+        provider = get_provider()
         
-        # Get income statement
-        income_stmt = company.income_stmt
-        
-        # Get balance sheet
-        balance_sheet = company.balance_sheet
-        
-        # Get cash flow
-        cash_flow = company.cashflow
+        # Get income statement, balance sheet and cash flow
+        statements = yahoo_call(provider.statements, ticker)
+        income_stmt = statements["income_stmt"]
+        balance_sheet = statements["balance_sheet"]
+        cash_flow = statements["cashflow"]
         
         # Get recent stats
-        info = company.info
+        info = yahoo_call(provider.info, ticker)
         
         # Compute financial metrics
         financials = {}
@@ -333,22 +337,17 @@ def fetch_company_financials(ticker):
         st.warning(f"Error fetching financials for {ticker}: {str(e)}")
         return {}
 
-@lru_cache(maxsize=50)
+@cached("fingraph.historical_prices", ttl=HISTORICAL_CACHE_TTL)
 def fetch_historical_data(ticker, period="1y", interval="1mo"):
     """Fetch historical price data for a company"""
     try:
-        data = yf.download(ticker, period=period, interval=interval, progress=False)
+        data = bar_store.get_bars(ticker, interval, start=bar_store.period_start(period))
         
         if data.empty:
             return {}
         
         # Format data as date -> price dictionary
-        historical_prices = {}
-        for date, row in data.iterrows():
-            date_str = date.strftime("%Y-%m-%d")
-            historical_prices[date_str] = float(row["Close"])
-        
-        return historical_prices
+        return {date.strftime("%Y-%m-%d"): float(close) for date, close in data["Close"].items()}
     
     except Exception as e:
         st.warning(f"Error fetching historical data for {ticker}: {str(e)}")
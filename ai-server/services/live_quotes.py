@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services.stocks_data import fetch_live_quote
+
+load_dotenv()
+
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "30"))
+# Updates arriving within this window are sent to a client as one message
+LIVE_COALESCE_SECONDS = float(os.getenv("LIVE_COALESCE_SECONDS", "0.25"))
+
+
+class QuoteHub:
+    """
+    One poller task per distinct ticker, shared by every subscriber.
+
+    Each poller re-syncs its ticker's latest bar every `interval` seconds
+    (fetch_live_quote, which skips the quote cache's freshness window and the
+    bar store's refresh interval) and puts (ticker, quote) on the queue of
+    every subscriber when the quote changed.
+    A poller starts with its first subscriber and stops with its last, so
+    upstream load follows the number of distinct tickers being watched, not the
+    number of connected clients. Subscriber bookkeeping stays on the event
+    loop, so no locking is needed.
+    """
+
+    def __init__(self, interval=LIVE_POLL_SECONDS):
+        self.interval = interval
+        self._subscribers = {}
+        self._pollers = {}
+        self._last_quotes = {}
+        self._polls = 0
+
+    def subscribe(self, ticker, queue):
+        """Registers `queue` for `ticker`; the last known quote, if any, is delivered right away."""
+        self._subscribers.setdefault(ticker, set()).add(queue)
+        if ticker not in self._pollers:
+            self._pollers[ticker] = asyncio.create_task(self._poll(ticker))
+        elif ticker in self._last_quotes:
+            queue.put_nowait((ticker, self._last_quotes[ticker]))
+
+    def unsubscribe(self, ticker, queue):
+        subscribers = self._subscribers.get(ticker)
+        if not subscribers:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[ticker]
+            poller = self._pollers.pop(ticker, None)
+            if poller is not None:
+                poller.cancel()
+            self._last_quotes.pop(ticker, None)
+
+    async def _poll(self, ticker):
+        while True:
+            try:
+                quote = await asyncio.to_thread(fetch_live_quote, ticker)
+                self._polls += 1
+            except Exception as e:
+                print(f"Live poll failed for {ticker}: {e}")
+                quote = None
+            if quote and quote.get("currentPrice") is not None and quote != self._last_quotes.get(ticker):
+                self._last_quotes[ticker] = quote
+                for queue in list(self._subscribers.get(ticker, ())):
+                    queue.put_nowait((ticker, quote))
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "poll_interval_seconds": self.interval,
+            "tickers": len(self._pollers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+            "polls": self._polls,
+        }
+
+
+class PortfolioSubscription:
+    """
+    Tracks one client's holdings and works out which positions a quote changed.
+
+    Lots are kept as NumPy arrays; an update for a ticker recomputes only that
+    ticker's lots and reports those whose value actually moved.
+    """
+
+    def __init__(self, stocks):
+        self.stocks = stocks
+        self.tickers = [stock["tickerSymbol"] for stock in stocks]
+        self.shares = np.array([stock.get("numberOfShares") or 0 for stock in stocks], dtype=np.float64)
+        self.purchase_prices = np.array([stock.get("purchasePrice") or 0 for stock in stocks], dtype=np.float64)
+        self.values = np.full(len(stocks), np.nan)
+        self.lots_by_ticker = {}
+        for index, ticker in enumerate(self.tickers):
+            self.lots_by_ticker.setdefault(ticker, []).append(index)
+
+    def total_value(self):
+        return float(np.nansum(self.values))
+
+    def apply(self, ticker, quote):
+        """Applies a quote and returns the positions whose value changed."""
+        indices = np.array(self.lots_by_ticker.get(ticker, []), dtype=np.intp)
+        if indices.size == 0:
+            return []
+        price = quote["currentPrice"]
+        new_values = np.round(price * self.shares[indices], 2)
+        changed = indices[new_values != self.values[indices]]
+        self.values[indices] = new_values
+        gains = np.round((price - self.purchase_prices[changed]) * self.shares[changed], 2)
+        return [
+            {
+                "index": int(index),
+                "tickerSymbol": ticker,
+                "currentPrice": price,
+                "dividendYield": quote.get("dividendYield"),
+                "stockValue": float(self.values[index]),
+                "unrealizedGainsLosses": float(gain),
+            }
+            for index, gain in zip(changed, gains)
+        ]
+
+    def weightages(self, positions):
+        total = self.total_value()
+        for position in positions:
+            position["weightageInPortfolio"] = round(position["stockValue"] / total * 100, 2) if total else 0
+        return positions
+
+
+hub = QuoteHub()
+
+
+async def serve_portfolio_socket(websocket, load_user_stocks):
+    """
+    Runs the live-valuation protocol on an accepted WebSocket.
+
+    Client messages:
+        {"type": "subscribe", "stocks": [...]}  holdings given inline (StockItem fields)
+        {"type": "subscribe", "userId": "..."}  holdings loaded from the portfolio store
+        {"type": "unsubscribe"}
+    A new subscribe replaces the previous one.
+
+    Server messages:
+        {"type": "subscribed", "positions": n, "tickers": n}
+        {"type": "positions", "positions": [...], "totalPortfolioValue": x}
+            only the lots whose value changed since the last message; weightage
+            is relative to the current total
+        {"type": "error", "detail": "..."}
+
+    Args:
+        websocket: Accepted starlette WebSocket
+        load_user_stocks: Callable returning the stored holdings for a user id
+    """
+    queue = asyncio.Queue()
+    subscription = None
+
+    def unsubscribe():
+        if subscription is not None:
+            for ticker in subscription.lots_by_ticker:
+                hub.unsubscribe(ticker, queue)
+
+    async def receive():
+        nonlocal subscription
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            kind = message.get("type")
+            if kind == "subscribe":
+                try:
+                    if message.get("userId"):
+                        stocks = await asyncio.to_thread(load_user_stocks, message["userId"])
+                    else:
+                        stocks = message.get("stocks") or []
+                        if not isinstance(stocks, list) or not all(isinstance(s, dict) for s in stocks):
+                            raise ValueError("stocks must be a list of objects")
+                        stocks = [s for s in stocks if s.get("tickerSymbol")]
+                    new_subscription = PortfolioSubscription(stocks)
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                unsubscribe()
+                subscription = new_subscription
+                await websocket.send_json({
+                    "type": "subscribed",
+                    "positions": len(stocks),
+                    "tickers": len(subscription.lots_by_ticker)
+                })
+                for ticker in subscription.lots_by_ticker:
+                    hub.subscribe(ticker, queue)
+            elif kind == "unsubscribe":
+                unsubscribe()
+                subscription = None
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+
+    async def send():
+        while True:
+            updates = [await queue.get()]
+            await asyncio.sleep(LIVE_COALESCE_SECONDS)
+            while not queue.empty():
+                updates.append(queue.get_nowait())
+            if subscription is None:
+                continue
+            positions = []
+            for ticker, quote in updates:
+                positions.extend(subscription.apply(ticker, quote))
+            if positions:
+                await websocket.send_text(json.dumps({
+                    "type": "positions",
+                    "positions": subscription.weightages(positions),
+                    "totalPortfolioValue": round(subscription.total_value(), 2)
+                }))
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and type(error).__name__ != "WebSocketDisconnect":
+                print(f"Live portfolio socket closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        unsubscribe()
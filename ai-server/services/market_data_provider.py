@@ -0,0 +1,240 @@
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "yahoo" talks to Yahoo Finance; "replay" serves recorded fixtures from REPLAY_FIXTURES_DIR
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yahoo")
+REPLAY_FIXTURES_DIR = os.getenv("REPLAY_FIXTURES_DIR", "./data/fixtures")
+REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", "0"))
+REPLAY_ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0"))
+REPLAY_SEED = int(os.getenv("REPLAY_SEED", "42"))
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume", "Dividends", "Stock Splits"]
+STATEMENTS = ("income_stmt", "balance_sheet", "cashflow")
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of quotes, price history and fundamentals.
+
+    History frames use the yfinance layout: a DatetimeIndex named 'Date' and
+    the OHLCV_COLUMNS columns. Multi-ticker downloads return columns grouped by
+    ticker (a MultiIndex of (ticker, field)), like `yf.download(group_by="ticker")`.
+    Subclasses must implement every method; an incomplete provider cannot be created.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", auto_adjust=False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, tickers, start=None, end=None, period=None, interval="1d"):
+        raise NotImplementedError
+
+    @abstractmethod
+    def info(self, ticker):
+        raise NotImplementedError
+
+    @abstractmethod
+    def statements(self, ticker):
+        """Returns {"income_stmt", "balance_sheet", "cashflow"} DataFrames (line items by period)."""
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    """Live provider backed by yfinance."""
+
+    name = "yahoo"
+
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", auto_adjust=False):
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        if start is None:
+            return stock.history(period=period or "max", interval=interval, auto_adjust=auto_adjust, actions=True)
+        return stock.history(start=start, end=end, interval=interval, auto_adjust=auto_adjust, actions=True)
+
+    def download(self, tickers, start=None, end=None, period=None, interval="1d"):
+        import yfinance as yf
+        window = {"start": start, "end": end} if start is not None else {"period": period or "max"}
+        return yf.download(
+            list(tickers), interval=interval, auto_adjust=False, actions=True,
+            group_by="ticker", threads=True, progress=False, **window
+        )
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def statements(self, ticker):
+        import yfinance as yf
+        company = yf.Ticker(ticker)
+        return {
+            "income_stmt": company.income_stmt,
+            "balance_sheet": company.balance_sheet,
+            "cashflow": company.cashflow,
+        }
+
+
+def _fixture_name(ticker):
+    return ticker.replace("/", "_")
+
+
+def _slice_history(df, start=None, end=None, period=None):
+    if start is None and period is not None and period != "max":
+        from services.bar_store import period_start
+        start = period_start(period)
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df.index < pd.Timestamp(end)]
+    return df
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Deterministic offline provider serving recorded fixtures.
+
+    Layout of `fixtures_dir`:
+        history/<TICKER>_<interval>.csv   OHLCV bars (Date column plus OHLCV_COLUMNS)
+        info/<TICKER>.json                Ticker.info dictionary
+        statements/<TICKER>_<name>.csv    income_stmt / balance_sheet / cashflow
+
+    Every call can be slowed by `latency_ms` (with +/-20% jitter) and fail with a
+    "429 Too Many Requests" error with probability `error_rate`, drawn from a
+    seeded generator so runs are reproducible.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures_dir=REPLAY_FIXTURES_DIR, latency_ms=REPLAY_LATENCY_MS, error_rate=REPLAY_ERROR_RATE, seed=REPLAY_SEED):
+        self.fixtures_dir = fixtures_dir
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._frames = {}
+        self.calls = 0
+
+    def _simulate_upstream(self):
+        with self._lock:
+            self.calls += 1
+            jitter = self._random.uniform(0.8, 1.2)
+            fail = self._random.random() < self.error_rate
+        if self.latency_ms:
+            time.sleep(self.latency_ms * jitter / 1000)
+        if fail:
+            raise Exception("429 Client Error: Too Many Requests (replay)")
+
+    def _load_history(self, ticker, interval):
+        key = (ticker, interval)
+        if key not in self._frames:
+            path = os.path.join(self.fixtures_dir, "history", f"{_fixture_name(ticker)}_{interval}.csv")
+            if not os.path.exists(path):
+                frame = pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+            else:
+                frame = pd.read_csv(path, parse_dates=["Date"], index_col="Date")
+                frame = frame.reindex(columns=OHLCV_COLUMNS)
+            self._frames[key] = frame
+        return self._frames[key]
+
+    def history(self, ticker, start=None, end=None, period=None, interval="1d", auto_adjust=False):
+        self._simulate_upstream()
+        df = _slice_history(self._load_history(ticker, interval), start, end, period).copy()
+        if auto_adjust:
+            df["Close"] = df["Adj Close"].where(df["Adj Close"].notna(), df["Close"])
+            df = df.drop(columns=["Adj Close"])
+        return df
+
+    def download(self, tickers, start=None, end=None, period=None, interval="1d"):
+        self._simulate_upstream()
+        frames = {}
+        for ticker in tickers:
+            df = _slice_history(self._load_history(ticker, interval), start, end, period)
+            if not df.empty:
+                frames[ticker] = df
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def info(self, ticker):
+        self._simulate_upstream()
+        path = os.path.join(self.fixtures_dir, "info", f"{_fixture_name(ticker)}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def statements(self, ticker):
+        self._simulate_upstream()
+        result = {}
+        for statement in STATEMENTS:
+            path = os.path.join(self.fixtures_dir, "statements", f"{_fixture_name(ticker)}_{statement}.csv")
+            result[statement] = pd.read_csv(path, index_col=0) if os.path.exists(path) else pd.DataFrame()
+        return result
+
+
+def record_fixtures(tickers, fixtures_dir=REPLAY_FIXTURES_DIR, intervals=("1d",), source=None):
+    """
+    Records live data for `tickers` into a fixtures directory for ReplayProvider.
+
+    Args:
+        tickers: Ticker symbols to record
+        fixtures_dir: Output directory
+        intervals: Bar intervals to record (full history for each)
+        source: Provider to record from (defaults to YahooProvider)
+    """
+    source = source or YahooProvider()
+    for sub in ("history", "info", "statements"):
+        os.makedirs(os.path.join(fixtures_dir, sub), exist_ok=True)
+
+    for ticker in tickers:
+        name = _fixture_name(ticker)
+        try:
+            for interval in intervals:
+                df = source.history(ticker, period="max", interval=interval)
+                idx = pd.DatetimeIndex(df.index)
+                if idx.tz is not None:
+                    df.index = idx.tz_localize(None)
+                df.index.name = "Date"
+                df.reindex(columns=OHLCV_COLUMNS).to_csv(os.path.join(fixtures_dir, "history", f"{name}_{interval}.csv"))
+            with open(os.path.join(fixtures_dir, "info", f"{name}.json"), "w") as f:
+                json.dump(source.info(ticker), f, indent=4, default=str)
+            for statement, frame in source.statements(ticker).items():
+                frame.to_csv(os.path.join(fixtures_dir, "statements", f"{name}_{statement}.csv"))
+            print(f"Recorded fixtures for {ticker}")
+        except Exception as e:
+            print(f"Could not record fixtures for {ticker}: {e}")
+
+
+_PROVIDER_TYPES = {"yahoo": YahooProvider, "replay": ReplayProvider}
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Returns the process-wide provider selected by MARKET_DATA_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if MARKET_DATA_PROVIDER not in _PROVIDER_TYPES:
+                    raise ValueError(f"Unknown market data provider: {MARKET_DATA_PROVIDER}")
+                _provider = _PROVIDER_TYPES[MARKET_DATA_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider):
+    """Replaces the process-wide provider (used by benchmarks and offline runs)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from services.cache_backend import get_cache
+from services.risk_analytics import load_close_matrix
+
+load_dotenv()
+
+MARKET_TIMEZONE = ZoneInfo(os.getenv("MARKET_TIMEZONE", "America/New_York"))
+# Local market time after which the day's closing bars are expected to be in the bar store
+MARKET_CLOSE_TIME = dt_time.fromisoformat(os.getenv("MARKET_CLOSE_TIME", "16:30"))
+
+# Entries are keyed by the last close, so the TTL only bounds how long stale keys linger
+history_cache = get_cache("portfolio_history", ttl=3 * 24 * 3600)
+
+
+def last_close_label(now=None):
+    """
+    Returns the date of the most recent completed market close (weekends skipped, holidays not).
+
+    Results keyed by this label are recomputed once per close.
+    """
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    day = now.date()
+    if now.time() < MARKET_CLOSE_TIME:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+def _lots_key(stocks, label, include_positions):
+    lots = [
+        (s.get("tickerSymbol"), s.get("numberOfShares"), s.get("purchasePrice"), s.get("purchaseDate"))
+        for s in stocks
+    ]
+    payload = json.dumps([lots, label, include_positions], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def compute_portfolio_history(stocks, include_positions=False):
+    """
+    Computes the portfolio's daily value from each lot's purchase date to the last close.
+
+    Builds one dates-by-lots matrix: lot values are close * shares where the
+    date is on or after the lot's purchase date, and zero before. Portfolio
+    value, invested cost and P&L are row sums of that matrix. Lots bought after
+    the last stored close have no price yet; they are left out of the curve and
+    totals and listed as pending positions with zero gain. The time-weighted
+    return treats each purchase as a cash flow at the start of its day:
+    r_t = V_t / (V_{t-1} + C_t) - 1, with C_t the cost of lots bought on day t.
+
+    Args:
+        stocks: List of holdings with tickerSymbol, numberOfShares, purchasePrice and purchaseDate
+        include_positions: Also return each lot's daily value series
+
+    Returns:
+        Dictionary of columnar arrays (dates, value, invested, gain,
+        cumulativeReturn) plus per-position contribution to total P&L.
+    """
+    lots = [
+        s for s in stocks
+        if s.get("tickerSymbol") and s.get("numberOfShares") and s.get("purchaseDate")
+    ]
+    if not lots:
+        raise ValueError("Portfolio has no stock positions with a purchase date")
+
+    purchase_dates = pd.to_datetime([s["purchaseDate"] for s in lots], errors="coerce").normalize()
+    if purchase_dates.isna().any():
+        bad = [s["tickerSymbol"] for s, d in zip(lots, purchase_dates) if pd.isna(d)]
+        raise ValueError(f"Invalid purchaseDate for: {', '.join(bad)}")
+
+    tickers = list(dict.fromkeys(s["tickerSymbol"] for s in lots))
+    prices = load_close_matrix(tickers, purchase_dates.min(), adjusted=False)
+    missing = [t for t in tickers if t not in prices.columns]
+    if prices.empty or len(missing) == len(tickers):
+        raise ValueError("No price history available for any position")
+
+    last_close = prices.index.max()
+    pending_lots = [
+        i for i, s in enumerate(lots)
+        if s["tickerSymbol"] in prices.columns and purchase_dates[i] > last_close
+    ]
+    priced_lots = [
+        i for i, s in enumerate(lots)
+        if s["tickerSymbol"] in prices.columns and purchase_dates[i] <= last_close
+    ]
+    if not priced_lots:
+        raise ValueError("No position was held at any stored close yet")
+    prices = prices[prices.index >= purchase_dates[priced_lots].min()]
+    lot_tickers = [lots[i]["tickerSymbol"] for i in priced_lots]
+    shares = np.array([float(lots[i]["numberOfShares"]) for i in priced_lots])
+    costs = np.array([float(lots[i].get("purchasePrice") or 0) for i in priced_lots]) * shares
+    lot_dates = purchase_dates[priced_lots].to_numpy()
+
+    dates = prices.index.to_numpy()
+    close_matrix = prices[lot_tickers].to_numpy()
+    # A lot bought before its ticker's first stored bar is valued at its first close
+    close_matrix = pd.DataFrame(close_matrix).bfill().to_numpy()
+    held = dates[:, None] >= lot_dates[None, :]
+
+    lot_values = np.where(held, close_matrix * shares, 0.0)
+    lot_costs = np.where(held, costs, 0.0)
+    value = lot_values.sum(axis=1)
+    invested = lot_costs.sum(axis=1)
+
+    # Cost of the lots entering on each day (first date a lot is held)
+    first_held = np.argmax(held, axis=0)
+    new_cost = np.bincount(first_held, weights=costs * held.any(axis=0), minlength=len(dates))
+    previous_value = np.concatenate([[0.0], value[:-1]])
+    base = previous_value + new_cost
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily_returns = np.where(base > 0, value / base - 1, 0.0)
+    cumulative_return = np.cumprod(1 + daily_returns) - 1
+
+    final_values = lot_values[-1]
+    gains = final_values - costs
+    total_cost = costs.sum()
+
+    result = {
+        "asOf": pd.Timestamp(dates[-1]).strftime("%Y-%m-%d"),
+        "start": pd.Timestamp(dates[0]).strftime("%Y-%m-%d"),
+        "dates": pd.DatetimeIndex(dates).strftime("%Y-%m-%d").tolist(),
+        "value": np.round(value, 2).tolist(),
+        "invested": np.round(invested, 2).tolist(),
+        "gain": np.round(value - invested, 2).tolist(),
+        "cumulativeReturn": np.round(cumulative_return, 6).tolist(),
+        "totalValue": round(float(value[-1]), 2),
+        "totalCost": round(float(total_cost), 2),
+        "totalGain": round(float(gains.sum()), 2),
+        "missingHistory": missing,
+        "positions": [],
+    }
+    for column, i in enumerate(priced_lots):
+        position = {
+            "index": i,
+            "tickerSymbol": lots[i]["tickerSymbol"],
+            "purchaseDate": lots[i]["purchaseDate"],
+            "numberOfShares": lots[i]["numberOfShares"],
+            "cost": round(float(costs[column]), 2),
+            "value": round(float(final_values[column]), 2),
+            "gain": round(float(gains[column]), 2),
+            "returnPct": round(float(gains[column] / costs[column] * 100), 4) if costs[column] else None,
+            # Percentage points of the portfolio's return on cost that this lot accounts for
+            "contributionPct": round(float(gains[column] / total_cost * 100), 4) if total_cost else None,
+            "pending": False,
+        }
+        if include_positions:
+            position["values"] = np.round(lot_values[:, column], 2).tolist()
+        result["positions"].append(position)
+    for i in pending_lots:
+        cost = float(lots[i].get("purchasePrice") or 0) * float(lots[i]["numberOfShares"])
+        result["positions"].append({
+            "index": i,
+            "tickerSymbol": lots[i]["tickerSymbol"],
+            "purchaseDate": lots[i]["purchaseDate"],
+            "numberOfShares": lots[i]["numberOfShares"],
+            "cost": round(cost, 2),
+            "value": None,
+            "gain": 0.0,
+            "returnPct": None,
+            "contributionPct": None,
+            # Bought after the last stored close; not part of the curve or totals yet
+            "pending": True,
+        })
+    result["positions"].sort(key=lambda position: position["index"])
+    return result
+
+
+def get_portfolio_history(stocks, include_positions=False):
+    """
+    Cached wrapper around compute_portfolio_history.
+
+    Results are keyed by the lots and the last market close, so a portfolio's
+    history is computed once per close and reused until the next one.
+    """
+    key = _lots_key(stocks, last_close_label(), include_positions)
+    result = history_cache.get(key)
+    if result is None:
+        result = compute_portfolio_history(stocks, include_positions)
+        history_cache[key] = result
+    return result
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from services import portfolio_store
+from services.bond_analytics import bond_market_values
+from services.async_market_data import BULK_CHUNK_SIZE
+from services.stocks_data import fetch_bulk_quotes, fetch_quote_once
+
+load_dotenv()
+
+# Minutes between scheduled revaluations of every stored portfolio; 0 disables the schedule
+REVALUATION_INTERVAL_MINUTES = float(os.getenv("REVALUATION_INTERVAL_MINUTES", "0"))
+
+_run_lock = threading.Lock()
+last_run = {}
+
+
+def fetch_unique_quotes(tickers, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Fetches each distinct ticker once, in bulk chunks through the bar store.
+
+    Tickers a bulk chunk did not refresh are fetched one at a time, so they
+    are never valued from stale stored bars.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    quotes = {}
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        try:
+            quotes.update(fetch_bulk_quotes(chunk))
+        except Exception as e:
+            print(f"Bulk quote fetch failed for {len(chunk)} tickers, fetching one by one: {e}")
+        for ticker in chunk:
+            if ticker in quotes:
+                continue
+            try:
+                quotes[ticker] = fetch_quote_once(ticker)
+            except Exception as e:
+                print(f"Could not price {ticker}: {e}")
+    return quotes
+
+
+def compute_valuations(stocks, bonds, quotes):
+    """
+    Values every user's holdings in one vectorized pass.
+
+    Prices are looked up once per distinct ticker and broadcast to every lot.
+    Lots whose ticker could not be priced keep their stored price. Bonds are
+    valued at their dirty market price by the bond analytics engine. Per-user
+    totals come from one bincount over user codes.
+
+    Args:
+        stocks: (id, user_id, ticker_symbol, number_of_shares, purchase_price, current_price) tuples
+        bonds: Bond records with id and userId
+        quotes: Dictionary of ticker to {"currentPrice", "dividendYield"}
+
+    Returns:
+        (stock_rows, bond_rows, users) in the shape portfolio_store.write_valuations expects.
+    """
+    stock_frame = pd.DataFrame(stocks, columns=["id", "user_id", "ticker", "shares", "purchase_price", "stored_price"])
+    bond_frame = pd.DataFrame({
+        "id": [bond["id"] for bond in bonds],
+        "user_id": [bond["userId"] for bond in bonds],
+        "market_value": bond_market_values(bonds),
+    })
+
+    user_codes, users = pd.factorize(pd.concat([stock_frame["user_id"], bond_frame["user_id"]], ignore_index=True))
+    stock_users = user_codes[:len(stock_frame)]
+    bond_users = user_codes[len(stock_frame):]
+
+    ticker_codes, tickers = pd.factorize(stock_frame["ticker"])
+    quote_prices = np.array([(quotes.get(t) or {}).get("currentPrice", np.nan) for t in tickers], dtype=np.float64)
+    quote_yields = np.array([(quotes.get(t) or {}).get("dividendYield", np.nan) for t in tickers], dtype=np.float64)
+
+    fresh_prices = quote_prices[ticker_codes] if len(tickers) else np.array([], dtype=np.float64)
+    fresh_yields = quote_yields[ticker_codes] if len(tickers) else np.array([], dtype=np.float64)
+    stored_prices = stock_frame["stored_price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    prices = np.where(np.isnan(fresh_prices), stored_prices, fresh_prices)
+
+    shares = stock_frame["shares"].to_numpy(dtype=np.float64, na_value=0.0)
+    purchase_prices = stock_frame["purchase_price"].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.nan_to_num(prices * shares)
+    gains = np.round(np.nan_to_num((prices - purchase_prices) * shares), 2)
+    bond_values = bond_frame["market_value"].to_numpy(dtype=np.float64)
+
+    totals = (
+        np.bincount(stock_users, weights=values, minlength=len(users))
+        + np.bincount(bond_users, weights=bond_values, minlength=len(users))
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stock_weights = np.nan_to_num(np.round(values / totals[stock_users] * 100, 2))
+        bond_weights = np.nan_to_num(np.round(bond_values / totals[bond_users] * 100, 2))
+
+    def optional(values):
+        return [None if np.isnan(v) else float(v) for v in values]
+
+    stock_rows = list(zip(
+        optional(fresh_prices),
+        gains.tolist(),
+        optional(fresh_yields),
+        stock_weights.tolist(),
+        stock_frame["id"].tolist(),
+    ))
+    bond_rows = list(zip(bond_weights.tolist(), bond_frame["id"].tolist()))
+    return stock_rows, bond_rows, list(users)
+
+
+def revalue_all_portfolios():
+    """
+    Revalues every stored portfolio with one bulk fetch per distinct ticker.
+
+    Upstream cost scales with the number of distinct tickers across all users,
+    not with the number of positions. Results for all users are written back in
+    a single transaction; users who edited their portfolio while quotes were
+    being fetched are skipped and picked up by the next run.
+
+    Returns:
+        Summary dictionary (users, positions, unique tickers, priced, failed, skipped users, seconds).
+    """
+    if not _run_lock.acquire(blocking=False):
+        return {"skipped": "A revaluation is already running"}
+    try:
+        started = time.monotonic()
+        # Versions are read first: an edit landing before the holdings are read only causes a needless skip
+        versions = portfolio_store.portfolio_versions()
+        stocks, bonds = portfolio_store.load_all_positions()
+        tickers = list(dict.fromkeys(row[2] for row in stocks))
+        quotes = fetch_unique_quotes(tickers)
+
+        stock_rows, bond_rows, users = compute_valuations(stocks, bonds, quotes)
+        skipped = portfolio_store.write_valuations(stock_rows, bond_rows, users, versions)
+
+        failed = [t for t in tickers if t not in quotes]
+        summary = {
+            "users": len(users),
+            "positions": len(stocks),
+            "bonds": len(bonds),
+            "uniqueTickers": len(tickers),
+            "pricedTickers": len(tickers) - len(failed),
+            "failedTickers": failed,
+            "skippedUsers": skipped,
+            "seconds": round(time.monotonic() - started, 3),
+            "finishedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        last_run.clear()
+        last_run.update(summary)
+        if skipped:
+            print(f"Skipped revaluation for {len(skipped)} users whose portfolio changed during the run")
+        print(f"Revalued {len(stocks)} positions for {len(users)} users using {len(tickers)} unique tickers in {summary['seconds']}s")
+        return summary
+    finally:
+        _run_lock.release()
+
+
+async def run_revaluation_schedule(interval_minutes=REVALUATION_INTERVAL_MINUTES):
+    """Runs revalue_all_portfolios every `interval_minutes` until cancelled."""
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            await asyncio.to_thread(revalue_all_portfolios)
+        except Exception as e:
+            print(f"Scheduled portfolio revaluation failed: {e}")
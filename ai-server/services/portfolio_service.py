@@ -0,0 +1,60 @@
+from fastapi import HTTPException
+
+from services.async_market_data import fetch_stocks_async, STOCKS_REQUEST_TIMEOUT
+from services.portfolio_valuation import value_portfolio, by_ticker_records
+
+ENRICHED_COLUMNS = ["currentPrice", "unrealizedGainsLosses", "dividendYield", "stockValue", "weightageInPortfolio"]
+
+
+async def price_stocks(stocks, timeout=STOCKS_REQUEST_TIMEOUT):
+    """
+    Fetches quotes for a list of holdings and values them.
+
+    Args:
+        stocks: List of StockItem objects
+        timeout: Seconds to wait for quotes before reporting the rest as failed
+
+    Returns:
+        The /stocks response body: enriched stocks, total value, per-ticker
+        aggregation and warnings for tickers that could not be priced.
+
+    Raises:
+        HTTPException: 503 when no ticker could be priced at all.
+    """
+    ticker_symbols = [stock.tickerSymbol for stock in stocks]
+
+    all_stock_data = await fetch_stocks_async(ticker_symbols, timeout=timeout)
+
+    valuation = value_portfolio(
+        ticker_symbols,
+        [stock.numberOfShares for stock in stocks],
+        [stock.purchasePrice for stock in stocks],
+        all_stock_data
+    )
+    lots = valuation["lots"]
+    failed_tickers = valuation["failedTickers"]
+
+    if not lots["priced"].any():
+        raise HTTPException(
+            status_code=503,
+            detail="Service temporarily unavailable. Could not fetch any stock data due to rate limiting."
+        )
+
+    priced_rows = lots.loc[lots["priced"], ENRICHED_COLUMNS].astype(object)
+    priced_rows = priced_rows.where(priced_rows.notna(), None)
+    enriched_stocks = [
+        {**stocks[i].dict(), **row}
+        for i, row in zip(priced_rows.index, priced_rows.to_dict(orient="records"))
+    ]
+
+    response_data = {
+        "message": "Stock data processed successfully!",
+        "totalPortfolioValue": round(valuation["totalPortfolioValue"], 2),
+        "stocks": enriched_stocks,
+        "positionsByTicker": by_ticker_records(valuation["byTicker"])
+    }
+
+    if failed_tickers:
+        response_data["warnings"] = f"Could not fetch data for these tickers: {', '.join(failed_tickers)}"
+
+    return response_data
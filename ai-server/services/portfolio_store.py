@@ -0,0 +1,486 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PORTFOLIO_DB_PATH = os.getenv("PORTFOLIO_DB_PATH", "./database/portfolio.db")
+# Owner of holdings that predate per-user storage (the legacy JSON files have no userId)
+DEFAULT_USER_ID = os.getenv("PORTFOLIO_DEFAULT_USER", "default")
+
+# JSON field name -> column name; anything else in a record is kept in the `extra` column
+STOCK_FIELDS = {
+    "stockName": "stock_name",
+    "tickerSymbol": "ticker_symbol",
+    "numberOfShares": "number_of_shares",
+    "purchasePrice": "purchase_price",
+    "purchaseDate": "purchase_date",
+    "currentPrice": "current_price",
+    "unrealizedGainsLosses": "unrealized_gains_losses",
+    "dividendYield": "dividend_yield",
+    "weightageInPortfolio": "weightage_in_portfolio",
+}
+BOND_FIELDS = {
+    "bondType": "bond_type",
+    "maturityDate": "maturity_date",
+    "couponRate": "coupon_rate",
+    "principal": "principal",
+    "yieldToMaturity": "yield_to_maturity",
+    "interestEarned": "interest_earned",
+    "weightageInPortfolio": "weightage_in_portfolio",
+}
+_TABLE_FIELDS = {"stocks": STOCK_FIELDS, "bonds": BOND_FIELDS}
+_RESERVED = {"id", "userId"}
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _create_schema(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            stock_name TEXT,
+            ticker_symbol TEXT NOT NULL,
+            number_of_shares NUMERIC,
+            purchase_price REAL,
+            purchase_date TEXT,
+            current_price REAL,
+            unrealized_gains_losses REAL,
+            dividend_yield REAL,
+            weightage_in_portfolio REAL,
+            extra TEXT,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bonds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            bond_type TEXT,
+            maturity_date TEXT,
+            coupon_rate REAL,
+            principal NUMERIC,
+            yield_to_maturity REAL,
+            interest_earned REAL,
+            weightage_in_portfolio REAL,
+            extra TEXT,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stocks_user ON stocks (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stocks_ticker ON stocks (ticker_symbol)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bonds_user ON bonds (user_id)")
+
+
+def _connect():
+    """Returns this thread's connection to the portfolio store, creating the schema on first use."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(PORTFOLIO_DB_PATH) or ".", exist_ok=True)
+        # Autocommit mode: write transactions are opened explicitly in _transaction
+        conn = sqlite3.connect(PORTFOLIO_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                _create_schema(conn)
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def _transaction(user_id=None):
+    """
+    Runs a write transaction, bumping `user_id`'s portfolio version on commit.
+
+    BEGIN IMMEDIATE takes the write lock up front so concurrent writers queue
+    on SQLite's busy timeout instead of failing half-way through.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        if user_id is not None:
+            _bump_version(conn, user_id)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _bump_version(conn, user_id):
+    conn.execute('''
+        INSERT INTO portfolio_versions (user_id, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+    ''', (user_id, _now()))
+
+
+def _to_row(table, record):
+    """Splits a JSON record into column values and the leftover `extra` JSON."""
+    fields = _TABLE_FIELDS[table]
+    values = {column: record.get(field) for field, column in fields.items()}
+    extra = {k: v for k, v in record.items() if k not in fields and k not in _RESERVED}
+    values["extra"] = json.dumps(extra) if extra else None
+    return values
+
+
+def _to_record(table, row):
+    """Turns a stored row back into the JSON record shape the API returns."""
+    record = {"id": row["id"], "userId": row["user_id"]}
+    for field, column in _TABLE_FIELDS[table].items():
+        record[field] = row[column]
+    if row["extra"]:
+        record.update(json.loads(row["extra"]))
+    return record
+
+
+def _list(table, user_id):
+    rows = _connect().execute(f"SELECT * FROM {table} WHERE user_id = ? ORDER BY id", (user_id,)).fetchall()
+    return [_to_record(table, row) for row in rows]
+
+
+def _insert(conn, table, user_id, record):
+    values = _to_row(table, record)
+    columns = ["user_id", *values.keys(), "updated_at"]
+    placeholders = ", ".join("?" for _ in columns)
+    cursor = conn.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        (user_id, *values.values(), _now())
+    )
+    return cursor.lastrowid
+
+
+def _update(conn, table, user_id, row_id, changes):
+    """Updates only the given fields of one row; returns False if the row does not belong to the user."""
+    fields = _TABLE_FIELDS[table]
+    assignments, params = [], []
+    extra_changes = {}
+    for field, value in changes.items():
+        if field in _RESERVED:
+            continue
+        if field in fields:
+            assignments.append(f"{fields[field]} = ?")
+            params.append(value)
+        else:
+            extra_changes[field] = value
+    if extra_changes:
+        row = conn.execute(f"SELECT extra FROM {table} WHERE id = ? AND user_id = ?", (row_id, user_id)).fetchone()
+        if row is None:
+            return False
+        extra = json.loads(row["extra"]) if row["extra"] else {}
+        extra.update(extra_changes)
+        assignments.append("extra = ?")
+        params.append(json.dumps(extra))
+    assignments.append("updated_at = ?")
+    params.append(_now())
+    cursor = conn.execute(
+        f"UPDATE {table} SET {', '.join(assignments)} WHERE id = ? AND user_id = ?",
+        (*params, row_id, user_id)
+    )
+    return cursor.rowcount > 0
+
+
+def _as_row_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _match_row_id(record, existing, by_client_id):
+    """
+    Finds the stored row a client record refers to, or None for a new record.
+
+    Records are matched by the store's `id`, or by the client's `_id`, which
+    is kept in `extra` and may also echo a store id back.
+    """
+    row_id = _as_row_id(record.get("id"))
+    if row_id in existing:
+        return row_id
+    client_id = record.get("_id")
+    if client_id is None:
+        return None
+    if str(client_id) in by_client_id:
+        return by_client_id[str(client_id)]
+    row_id = _as_row_id(client_id)
+    return row_id if row_id in existing else None
+
+
+def _replace_all(table, user_id, records):
+    """
+    Makes the user's rows match `records` in one transaction.
+
+    Records matching a stored row by `id` or `_id` are updated in place, the
+    rest are inserted, and the user's rows missing from `records` are deleted.
+    """
+    with _transaction(user_id) as conn:
+        existing, by_client_id = set(), {}
+        for row in conn.execute(f"SELECT id, extra FROM {table} WHERE user_id = ?", (user_id,)):
+            existing.add(row["id"])
+            client_id = json.loads(row["extra"]).get("_id") if row["extra"] else None
+            if client_id is not None:
+                by_client_id[str(client_id)] = row["id"]
+        kept = set()
+        for record in records:
+            row_id = _match_row_id(record, existing, by_client_id)
+            if row_id is not None and row_id not in kept:
+                _update(conn, table, user_id, row_id, record)
+                kept.add(row_id)
+            else:
+                _insert(conn, table, user_id, record)
+        stale = existing - kept
+        if stale:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id in stale])
+
+
+# ------ Stocks ------- #
+
+def list_stocks(user_id=DEFAULT_USER_ID):
+    """Returns the user's stock holdings in insertion order."""
+    return _list("stocks", user_id)
+
+
+def add_stock(stock, user_id=DEFAULT_USER_ID):
+    """Inserts one stock holding and returns its id."""
+    with _transaction(user_id) as conn:
+        return _insert(conn, "stocks", user_id, stock)
+
+
+def update_stock(stock_id, changes, user_id=DEFAULT_USER_ID):
+    """Updates the given fields of one stock holding; returns False if it does not exist."""
+    with _transaction(user_id) as conn:
+        return _update(conn, "stocks", user_id, stock_id, changes)
+
+
+def delete_stock(stock_id, user_id=DEFAULT_USER_ID):
+    with _transaction(user_id) as conn:
+        return conn.execute("DELETE FROM stocks WHERE id = ? AND user_id = ?", (stock_id, user_id)).rowcount > 0
+
+
+def replace_stocks(stocks, user_id=DEFAULT_USER_ID):
+    _replace_all("stocks", user_id, stocks)
+
+
+# ------ Bonds ------- #
+
+def list_bonds(user_id=DEFAULT_USER_ID):
+    """Returns the user's bond holdings in insertion order."""
+    return _list("bonds", user_id)
+
+
+def add_bond(bond, user_id=DEFAULT_USER_ID):
+    """Inserts one bond holding and returns its id."""
+    with _transaction(user_id) as conn:
+        return _insert(conn, "bonds", user_id, bond)
+
+
+def update_bond(bond_id, changes, user_id=DEFAULT_USER_ID):
+    """Updates the given fields of one bond holding; returns False if it does not exist."""
+    with _transaction(user_id) as conn:
+        return _update(conn, "bonds", user_id, bond_id, changes)
+
+
+def delete_bond(bond_id, user_id=DEFAULT_USER_ID):
+    with _transaction(user_id) as conn:
+        return conn.execute("DELETE FROM bonds WHERE id = ? AND user_id = ?", (bond_id, user_id)).rowcount > 0
+
+
+def replace_bonds(bonds, user_id=DEFAULT_USER_ID):
+    _replace_all("bonds", user_id, bonds)
+
+
+# ------ Portfolio ------- #
+
+def list_users():
+    """Returns every user id that has holdings."""
+    rows = _connect().execute("SELECT user_id FROM stocks UNION SELECT user_id FROM bonds ORDER BY user_id").fetchall()
+    return [row["user_id"] for row in rows]
+
+
+def portfolio_state(user_id=DEFAULT_USER_ID):
+    """
+    Returns (version, updated_at) for the user's holdings.
+
+    The version increases on every committed change; updated_at is the local
+    time of that change (None if the portfolio was never written).
+    """
+    row = _connect().execute("SELECT version, updated_at FROM portfolio_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return (row["version"], row["updated_at"]) if row else (0, None)
+
+
+def portfolio_version(user_id=DEFAULT_USER_ID):
+    """Returns a counter that increases on every committed change to the user's holdings."""
+    return portfolio_state(user_id)[0]
+
+
+def portfolio_versions():
+    """Returns user id -> portfolio version for every user whose portfolio was ever written."""
+    rows = _connect().execute("SELECT user_id, version FROM portfolio_versions").fetchall()
+    return {row["user_id"]: row["version"] for row in rows}
+
+
+def update_weightages(user_id=DEFAULT_USER_ID, bond_values=None):
+    """
+    Recomputes weightageInPortfolio for one user's stocks and bonds.
+
+    Stocks are valued at currentPrice * numberOfShares. Bonds are valued at
+    `bond_values` ({bond id: market value}) when given, otherwise at their
+    principal. Everything is updated in a single transaction, so only this
+    user's rows are touched.
+    """
+    with _transaction(user_id) as conn:
+        stock_total = conn.execute(
+            "SELECT COALESCE(SUM(current_price * number_of_shares), 0) FROM stocks WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()[0]
+        if bond_values is None:
+            bond_values = {
+                row["id"]: row["principal"] or 0
+                for row in conn.execute("SELECT id, principal FROM bonds WHERE user_id = ?", (user_id,))
+            }
+        total = stock_total + sum(bond_values.values())
+        if not total:
+            conn.execute("UPDATE stocks SET weightage_in_portfolio = 0 WHERE user_id = ?", (user_id,))
+            conn.execute("UPDATE bonds SET weightage_in_portfolio = 0 WHERE user_id = ?", (user_id,))
+            return
+        conn.execute('''
+            UPDATE stocks
+            SET weightage_in_portfolio = COALESCE(ROUND(current_price * number_of_shares / ? * 100, 2), 0)
+            WHERE user_id = ?
+        ''', (total, user_id))
+        conn.executemany(
+            "UPDATE bonds SET weightage_in_portfolio = ? WHERE id = ? AND user_id = ?",
+            ((round(value / total * 100, 2), bond_id, user_id) for bond_id, value in bond_values.items())
+        )
+
+
+def load_all_positions():
+    """
+    Returns every user's holdings for batch jobs.
+
+    Returns:
+        (stocks, bonds): lists of tuples
+            stocks: (id, user_id, ticker_symbol, number_of_shares, purchase_price, current_price)
+            bonds: bond records (as list_bonds returns them) across all users
+    """
+    conn = _connect()
+    stocks = conn.execute('''
+        SELECT id, user_id, ticker_symbol, number_of_shares, purchase_price, current_price
+        FROM stocks ORDER BY user_id, id
+    ''').fetchall()
+    bonds = conn.execute("SELECT * FROM bonds ORDER BY user_id, id").fetchall()
+    return [tuple(row) for row in stocks], [_to_record("bonds", row) for row in bonds]
+
+
+def write_valuations(stock_rows, bond_rows, user_ids, versions=None):
+    """
+    Writes batch valuation results for many users in one transaction.
+
+    With `versions`, users whose portfolio changed since those versions were
+    read are skipped, so a valuation computed from old share counts never
+    overwrites an edit made while quotes were being fetched.
+
+    Args:
+        stock_rows: Iterable of (current_price, unrealized_gains_losses, dividend_yield, weightage, id);
+            a None price or dividend yield keeps the stored value
+        bond_rows: Iterable of (weightage, id)
+        user_ids: Users whose portfolio version should be bumped
+        versions: Optional user id -> portfolio version the valuation was computed at
+            (see portfolio_versions, read before the holdings)
+
+    Returns:
+        list: Users that were skipped because their portfolio changed.
+    """
+    now = _now()
+    with _transaction() as conn:
+        skipped = []
+        if versions is not None:
+            current = {
+                row["user_id"]: row["version"]
+                for row in conn.execute("SELECT user_id, version FROM portfolio_versions").fetchall()
+            }
+            skipped = [user_id for user_id in user_ids if current.get(user_id, 0) != versions.get(user_id, 0)]
+        if skipped:
+            placeholders = ", ".join("?" * len(skipped))
+            skip_stocks = {row[0] for row in conn.execute(f"SELECT id FROM stocks WHERE user_id IN ({placeholders})", skipped)}
+            skip_bonds = {row[0] for row in conn.execute(f"SELECT id FROM bonds WHERE user_id IN ({placeholders})", skipped)}
+            stock_rows = [row for row in stock_rows if row[-1] not in skip_stocks]
+            bond_rows = [row for row in bond_rows if row[-1] not in skip_bonds]
+        conn.executemany('''
+            UPDATE stocks SET
+                current_price = COALESCE(?, current_price),
+                unrealized_gains_losses = ?,
+                dividend_yield = COALESCE(?, dividend_yield),
+                weightage_in_portfolio = ?,
+                updated_at = ?
+            WHERE id = ?
+        ''', ((price, gains, dividend_yield, weight, now, row_id) for price, gains, dividend_yield, weight, row_id in stock_rows))
+        conn.executemany(
+            "UPDATE bonds SET weightage_in_portfolio = ?, updated_at = ? WHERE id = ?",
+            ((weight, now, row_id) for weight, row_id in bond_rows)
+        )
+        for user_id in user_ids:
+            if user_id not in skipped:
+                _bump_version(conn, user_id)
+    return skipped
+
+
+def migrate_json(stocks_file, bonds_file, user_id=DEFAULT_USER_ID):
+    """
+    Imports legacy JSON holdings for `user_id` unless their portfolio was ever written.
+
+    Every write bumps the user's version, so holdings deleted through the
+    store are not brought back from the JSON files on the next start.
+
+    Returns:
+        True if anything was imported.
+    """
+    if portfolio_version(user_id) > 0:
+        return False
+
+    def read(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    stocks, bonds = read(stocks_file), read(bonds_file)
+    if not stocks and not bonds:
+        return False
+    # Checked again under the write lock: workers starting together all saw version 0 above
+    with _transaction() as conn:
+        row = conn.execute("SELECT version FROM portfolio_versions WHERE user_id = ?", (user_id,)).fetchone()
+        if row is not None and row["version"] > 0:
+            return False
+        for stock in stocks:
+            _insert(conn, "stocks", user_id, stock)
+        for bond in bonds:
+            _insert(conn, "bonds", user_id, bond)
+        _bump_version(conn, user_id)
+    print(f"Migrated {len(stocks)} stocks and {len(bonds)} bonds from JSON into the portfolio store")
+    return True
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+def value_portfolio(tickers, shares, purchase_prices, quotes):
+    """
+    Values a portfolio of lots in one vectorized pass.
+
+    Lots are given as columnar arrays (one entry per lot, tickers may repeat).
+    Prices are looked up once per distinct ticker, then every per-lot and
+    per-ticker figure is computed with NumPy array operations.
+
+    Args:
+        tickers: Sequence of ticker symbols, one per lot
+        shares: Sequence of share counts, one per lot
+        purchase_prices: Sequence of purchase prices, one per lot
+        quotes: Dictionary of ticker to {"currentPrice", "dividendYield"}
+
+    Returns:
+        Dictionary with
+            "lots": pd.DataFrame (one row per lot, input order) with currentPrice,
+                dividendYield, stockValue, unrealizedGainsLosses, weightageInPortfolio
+                and a boolean `priced` column,
+            "byTicker": pd.DataFrame indexed by ticker aggregating all lots
+                (numberOfShares, costBasis, averagePurchasePrice, stockValue,
+                unrealizedGainsLosses, weightageInPortfolio, lots),
+            "totalPortfolioValue": float,
+            "failedTickers": list of tickers without a price (first-seen order).
+    """
+    tickers = np.asarray(tickers, dtype=object)
+    shares = np.asarray(shares, dtype=np.float64)
+    purchase_prices = np.asarray(purchase_prices, dtype=np.float64)
+
+    codes, unique_tickers = pd.factorize(tickers, sort=False)
+    n_unique = len(unique_tickers)
+
+    unique_prices = np.full(n_unique, np.nan)
+    unique_yields = np.full(n_unique, np.nan)
+    for i, ticker in enumerate(unique_tickers):
+        quote = quotes.get(ticker) or {}
+        if quote.get("currentPrice") is not None:
+            unique_prices[i] = quote["currentPrice"]
+        if quote.get("dividendYield") is not None:
+            unique_yields[i] = quote["dividendYield"]
+
+    prices = unique_prices[codes]
+    priced = ~np.isnan(prices)
+
+    values = np.where(priced, prices * shares, 0.0)
+    gains = np.where(priced, (prices - purchase_prices) * shares, 0.0)
+    total_value = float(values.sum())
+    weights = values / total_value * 100 if total_value > 0 else np.zeros_like(values)
+
+    lots = pd.DataFrame({
+        "tickerSymbol": tickers,
+        "currentPrice": prices,
+        "dividendYield": unique_yields[codes],
+        "stockValue": np.round(values, 2),
+        "unrealizedGainsLosses": np.round(gains, 2),
+        "weightageInPortfolio": np.round(weights, 2),
+        "priced": priced,
+    })
+
+    cost = shares * purchase_prices
+    agg_shares = np.bincount(codes, weights=shares, minlength=n_unique)
+    agg_cost = np.bincount(codes, weights=cost, minlength=n_unique)
+    agg_values = np.bincount(codes, weights=values, minlength=n_unique)
+    agg_gains = np.bincount(codes, weights=gains, minlength=n_unique)
+    lot_counts = np.bincount(codes, minlength=n_unique)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average_cost = np.where(agg_shares != 0, agg_cost / agg_shares, 0.0)
+
+    by_ticker = pd.DataFrame({
+        "numberOfShares": agg_shares,
+        "costBasis": np.round(agg_cost, 2),
+        "averagePurchasePrice": np.round(average_cost, 4),
+        "currentPrice": unique_prices,
+        "stockValue": np.round(agg_values, 2),
+        "unrealizedGainsLosses": np.round(agg_gains, 2),
+        "weightageInPortfolio": np.round(agg_values / total_value * 100, 2) if total_value > 0 else np.zeros(n_unique),
+        "lots": lot_counts,
+    }, index=pd.Index(unique_tickers, name="tickerSymbol"))
+
+    return {
+        "lots": lots,
+        "byTicker": by_ticker,
+        "totalPortfolioValue": total_value,
+        "failedTickers": [t for t, p in zip(unique_tickers, unique_prices) if np.isnan(p)],
+    }
+
+
+def by_ticker_records(by_ticker):
+    """Serializes the per-ticker aggregation to JSON-friendly records (NaN becomes None)."""
+    frame = by_ticker.reset_index().astype(object)
+    return frame.where(pd.notna(frame), None).to_dict(orient="records")
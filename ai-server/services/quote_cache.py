@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+FRESH = "fresh"
+STALE = "stale"
+NEGATIVE = "negative"
+MISS = "miss"
+
+
+class QuoteCache:
+    """
+    Size-bounded LRU cache with stale-while-revalidate and negative entries.
+
+    An entry is fresh for `fresh_ttl` seconds, then stale (still served, but the
+    caller should refresh it) until `stale_ttl`, after which it is treated as a
+    miss. Failures are remembered for `negative_ttl` seconds so callers can skip
+    upstream retries for tickers that just failed. The least recently used entry
+    is evicted once `max_entries` is reached.
+
+    When a shared `backend` (see services.cache_backend) is given, entries are
+    written through to it and local misses are filled from it, so every worker
+    benefits from quotes fetched by the others.
+    """
+
+    def __init__(self, max_entries=2048, fresh_ttl=900, stale_ttl=3600, negative_ttl=60, backend=None, namespace="quotes"):
+        self.max_entries = max_entries
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self._prefix = f"{namespace}:"
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "stale_hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "refreshes": 0}
+
+    def _status(self, entry, now):
+        _, stored_at, failed = entry
+        age = now - stored_at
+        if failed:
+            return NEGATIVE if age < self.negative_ttl else MISS
+        if age < self.fresh_ttl:
+            return FRESH
+        if age < self.stale_ttl:
+            return STALE
+        return MISS
+
+    def lookup(self, key, count=True):
+        """
+        Returns (status, value) where status is one of FRESH, STALE, NEGATIVE or MISS.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.backend is not None:
+            entry = self.backend.get(self._prefix + key)
+            if entry is not None:
+                with self._lock:
+                    self._entries[key] = entry
+                    self._evict()
+        with self._lock:
+            status, value = MISS, None
+            if entry is not None:
+                status = self._status(entry, now)
+                if status == MISS:
+                    self._entries.pop(key, None)
+                else:
+                    value = entry[0]
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+            if count:
+                counter = {FRESH: "hits", STALE: "stale_hits", NEGATIVE: "negative_hits", MISS: "misses"}[status]
+                self._counters[counter] += 1
+        return status, value
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _store(self, key, value, failed):
+        entry = (value, time.time(), failed)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        if self.backend is not None:
+            ttl = self.negative_ttl if failed else self.stale_ttl
+            try:
+                self.backend.set(self._prefix + key, entry, ttl)
+            except Exception as e:
+                print(f"Could not write {key} to shared quote cache: {e}")
+
+    def set(self, key, value):
+        self._store(key, value, failed=False)
+
+    def set_failure(self, key):
+        """Remembers that `key` just failed, unless a usable value is still cached."""
+        status, _ = self.lookup(key, count=False)
+        if status in (FRESH, STALE):
+            return
+        self._store(key, None, failed=True)
+
+    def begin_refresh(self, key):
+        """Marks `key` as being refreshed; returns False if a refresh is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self._counters["refreshes"] += 1
+            return True
+
+    def end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear(self._prefix)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["stale_hits"] + self._counters["negative_hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+                "refreshing": len(self._refreshing),
+                "hit_ratio": round((self._counters["hits"] + self._counters["stale_hits"]) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+YAHOO_REQUESTS_PER_SECOND = float(os.getenv("YAHOO_REQUESTS_PER_SECOND", "4"))
+YAHOO_BURST = int(os.getenv("YAHOO_BURST", "8"))
+YAHOO_BREAKER_THRESHOLD = int(os.getenv("YAHOO_BREAKER_THRESHOLD", "3"))
+YAHOO_BREAKER_COOLDOWN = float(os.getenv("YAHOO_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Yahoo while the circuit breaker is open."""
+
+
+def is_throttling_error(error):
+    """
+    True for the errors Yahoo / yfinance use to signal rate limiting.
+
+    A bare "429" is not enough, since tickers (6429.T) and prices can contain it;
+    the HTTP status of the error's response or the "429 Client Error" text is used instead.
+    """
+    message = str(error)
+    response = getattr(error, "response", None)
+    return (
+        getattr(response, "status_code", None) == 429
+        or "Too Many Requests" in message
+        or "Rate limited" in message
+        or "429 Client Error" in message
+        or type(error).__name__ == "YFRateLimitError"
+    )
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every worker that talks to the same upstream.
+
+    Tokens refill continuously at `rate` per second up to `burst`; callers block
+    in `acquire` until a token is available instead of sleeping a fixed delay.
+    Time spent waiting for a token is recorded for monitoring.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and consumes it."""
+        started = time.monotonic()
+        queued = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    waited = now - started
+                    self._acquired += 1
+                    self._total_wait += waited
+                    self._max_wait = max(self._max_wait, waited)
+                    self._recent_waits.append(waited)
+                    if queued:
+                        self._waiting -= 1
+                    return waited
+                if not queued:
+                    self._waiting += 1
+                    queued = True
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            p95 = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "available_tokens": round(self._tokens, 2),
+                "queued": self._waiting,
+                "acquired": self._acquired,
+                "avg_wait_seconds": round(self._total_wait / self._acquired, 4) if self._acquired else 0.0,
+                "p95_wait_seconds": round(p95, 4),
+                "max_wait_seconds": round(self._max_wait, 4),
+            }
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is throttling us.
+
+    After `failure_threshold` consecutive throttling errors the circuit opens
+    and every call raises CircuitOpenError for `cooldown` seconds. Then a single
+    trial call is let through (half-open): success closes the circuit, another
+    throttling error re-opens it for a new cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._trips = 0
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self._rejected += 1
+                    raise CircuitOpenError("Yahoo Finance circuit open after repeated throttling")
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._trial_running:
+                    self._rejected += 1
+                    raise CircuitOpenError("Yahoo Finance circuit half-open, trial request in flight")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._state = self.CLOSED
+
+    def record_failure(self, throttled):
+        with self._lock:
+            self._trial_running = False
+            if not throttled:
+                self._failures = 0
+                if self._state == self.HALF_OPEN:
+                    self._state = self.CLOSED
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_throttles": self._failures,
+                "rejected": self._rejected,
+                "trips": self._trips,
+            }
+
+
+yahoo_limiter = RateLimiter(YAHOO_REQUESTS_PER_SECOND, YAHOO_BURST)
+yahoo_breaker = CircuitBreaker(YAHOO_BREAKER_THRESHOLD, YAHOO_BREAKER_COOLDOWN)
+
+
+def yahoo_call(fn, *args, **kwargs):
+    """
+    Runs one Yahoo Finance request under the process-wide budget.
+
+    Every yfinance call (including lazy attributes like `Ticker.info`, wrapped
+    in a lambda) should go through here so that pacing and the circuit breaker
+    see all of the process's traffic.
+
+    Raises:
+        CircuitOpenError: While Yahoo is throttling us.
+    """
+    yahoo_breaker.before_call()
+    yahoo_limiter.acquire()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        yahoo_breaker.record_failure(is_throttling_error(e))
+        raise
+    yahoo_breaker.record_success()
+    return result
+
+
+def yahoo_stats():
+    return {"limiter": yahoo_limiter.stats(), "circuit_breaker": yahoo_breaker.stats()}
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from services import bar_store
+
+TRADING_DAYS = 252
+DEFAULT_BENCHMARK = "^GSPC"
+
+
+def load_close_matrix(tickers, start, interval="1d", adjusted=True):
+    """
+    Builds a days-by-tickers matrix of closes from the local bar store.
+
+    Stored series are synced first (one bulk call for stale tickers, nothing
+    at all when they were refreshed recently), then read from disk. With
+    `adjusted`, dividend-adjusted closes are used when available so dividends
+    count towards returns; otherwise the traded (split-adjusted) close is used,
+    which is what a holding is actually worth. Dates are the union across
+    tickers with gaps forward-filled.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    bar_store.sync_bars_many(tickers, interval, start=start)
+
+    columns = {}
+    for ticker in tickers:
+        try:
+            bars = bar_store.get_bars(ticker, interval, start=start)
+        except Exception as e:
+            print(f"No history available for {ticker}: {e}")
+            continue
+        if bars.empty:
+            continue
+        closes = bars["Adj Close"].where(bars["Adj Close"].notna(), bars["Close"]) if adjusted else bars["Close"]
+        columns[ticker] = closes
+    if not columns:
+        return pd.DataFrame()
+    return pd.DataFrame(columns).sort_index().ffill()
+
+
+def _var_cvar(returns, confidence):
+    """Historical VaR and CVaR (expected shortfall) as positive loss fractions."""
+    cutoff = np.quantile(returns, 1 - confidence)
+    tail = returns[returns <= cutoff]
+    return float(-cutoff), float(-tail.mean()) if tail.size else float(-cutoff)
+
+
+def _max_drawdown(returns):
+    wealth = np.cumprod(1 + returns)
+    peaks = np.maximum.accumulate(wealth)
+    drawdowns = wealth / peaks - 1
+    trough = int(np.argmin(drawdowns)) if drawdowns.size else 0
+    return float(-drawdowns.min()) if drawdowns.size else 0.0, trough
+
+
+def compute_portfolio_risk(stocks, bond_value=0.0, benchmark=DEFAULT_BENCHMARK, lookback_days=365, confidence_levels=(0.95, 0.99)):
+    """
+    Computes portfolio risk metrics from locally cached daily history.
+
+    Positions are weighted by current market value (last close times shares).
+    Bonds have no price history here, so their value enters as a zero-volatility
+    sleeve that dilutes equity risk. All metrics come from one vectorized pass
+    over the days-by-positions return matrix.
+
+    Args:
+        stocks: List of holdings with tickerSymbol and numberOfShares
+        bond_value: Total current value of the bond holdings
+        benchmark: Ticker used for beta
+        lookback_days: Calendar days of history to use
+        confidence_levels: Confidence levels for VaR / CVaR
+
+    Returns:
+        Dictionary of risk metrics (annualized volatility, beta, correlation and
+        covariance matrices, VaR/CVaR, max drawdown, per-position detail).
+    """
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=lookback_days)
+
+    holdings = [s for s in stocks if s.get("tickerSymbol") and s.get("numberOfShares")]
+    tickers = list(dict.fromkeys(s["tickerSymbol"] for s in holdings))
+    if not tickers:
+        raise ValueError("Portfolio has no stock positions")
+
+    prices = load_close_matrix(tickers + [benchmark], start)
+    available = [t for t in tickers if t in prices.columns]
+    missing = [t for t in tickers if t not in prices.columns]
+    if not available:
+        raise ValueError("No price history available for any position")
+
+    price_matrix = prices[available].dropna(how="any")
+    returns = price_matrix.pct_change().dropna(how="any")
+    if len(returns) < 2:
+        raise ValueError("Not enough overlapping history to compute risk")
+
+    shares = pd.Series(0.0, index=available)
+    for holding in holdings:
+        if holding["tickerSymbol"] in shares.index:
+            shares[holding["tickerSymbol"]] += float(holding["numberOfShares"])
+
+    last_prices = price_matrix.iloc[-1].to_numpy()
+    position_values = last_prices * shares.to_numpy()
+    bond_total = float(bond_value)
+    total_value = float(position_values.sum()) + bond_total
+    weights = position_values / total_value
+
+    R = returns.to_numpy()
+    portfolio_returns = R @ weights
+
+    cov = np.atleast_2d(np.cov(R, rowvar=False)) * TRADING_DAYS
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.outer(std, std)
+    marginal = cov @ weights
+    portfolio_variance = float(weights @ marginal)
+    portfolio_vol = float(np.sqrt(portfolio_variance))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        risk_contribution = weights * marginal / portfolio_variance if portfolio_variance > 0 else np.zeros_like(weights)
+
+    result = {
+        "asOf": returns.index[-1].strftime("%Y-%m-%d"),
+        "observations": int(len(returns)),
+        "totalPortfolioValue": round(total_value, 2),
+        "bondValue": round(bond_total, 2),
+        "annualizedVolatility": round(portfolio_vol, 6),
+        "annualizedReturn": round(float(portfolio_returns.mean() * TRADING_DAYS), 6),
+        "tickers": available,
+        "covarianceMatrix": np.round(cov, 8).tolist(),
+        "correlationMatrix": np.round(np.nan_to_num(corr), 6).tolist(),
+        "valueAtRisk": {},
+        "missingHistory": missing,
+    }
+
+    for confidence in confidence_levels:
+        var, cvar = _var_cvar(portfolio_returns, confidence)
+        label = f"{int(round(confidence * 100))}"
+        result["valueAtRisk"][label] = {
+            "var": round(var, 6),
+            "cvar": round(cvar, 6),
+            "varAmount": round(var * total_value, 2),
+            "cvarAmount": round(cvar * total_value, 2),
+        }
+
+    max_drawdown, trough = _max_drawdown(portfolio_returns)
+    result["maxDrawdown"] = round(max_drawdown, 6)
+    result["maxDrawdownDate"] = returns.index[trough].strftime("%Y-%m-%d")
+
+    betas = np.full(len(available), np.nan)
+    portfolio_beta = None
+    if benchmark in prices.columns:
+        bench_returns = prices[benchmark].reindex(price_matrix.index).pct_change().reindex(returns.index)
+        mask = bench_returns.notna().to_numpy()
+        b = bench_returns.to_numpy()[mask]
+        var_b = b.var(ddof=1) if b.size > 1 else 0.0
+        if var_b > 0:
+            centered = R[mask] - R[mask].mean(axis=0)
+            betas = centered.T @ (b - b.mean()) / (b.size - 1) / var_b
+            portfolio_beta = float(weights @ betas)
+    result["benchmark"] = benchmark
+    result["beta"] = round(portfolio_beta, 6) if portfolio_beta is not None else None
+
+    result["positions"] = [
+        {
+            "tickerSymbol": ticker,
+            "weight": round(float(weights[i]), 6),
+            "annualizedVolatility": round(float(std[i]), 6),
+            "beta": round(float(betas[i]), 6) if not np.isnan(betas[i]) else None,
+            "riskContribution": round(float(risk_contribution[i]), 6),
+        }
+        for i, ticker in enumerate(available)
+    ]
+    return result
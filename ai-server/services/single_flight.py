@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent work for the same key.
+
+    The first caller for a key becomes the leader and does the work; callers
+    arriving while it is in flight wait on the leader's future and receive the
+    same result (or exception). Once the leader resolves, the key is released,
+    so later callers start a new flight (results are cached elsewhere).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def claim(self, key):
+        """
+        Registers interest in `key`.
+
+        Returns:
+            (future, is_leader). The leader must call `resolve` for the key.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.stats["leaders"] += 1
+            return future, True
+
+    def resolve(self, key, result=None, error=None):
+        """Publishes the leader's outcome to every waiter and releases the key."""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs `fn` once per in-flight key and returns its result to every caller."""
+        future, is_leader = self.claim(key)
+        if not is_leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, result=result)
+        return result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
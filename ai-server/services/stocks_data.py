@@ -1,90 +1,207 @@
-import yfinance as yf
-import time, random
-from datetime import datetime, timedelta
+import random, os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from dotenv import load_dotenv
+from services import bar_store
+from services.single_flight import SingleFlight
+from services.quote_cache import QuoteCache, FRESH, STALE, NEGATIVE
+from services.cache_backend import get_shared_backend
+from services.rate_limiter import is_throttling_error
+
+load_dotenv()
 
-cache = {}
 CACHE_EXPIRY = timedelta(minutes=15)  
+CACHE_STALE_WINDOW = timedelta(minutes=int(os.getenv("QUOTE_STALE_MINUTES", "60")))
+NEGATIVE_CACHE_EXPIRY = timedelta(seconds=int(os.getenv("QUOTE_NEGATIVE_SECONDS", "60")))
+MAX_FETCH_WORKERS = int(os.getenv("MAX_FETCH_WORKERS", "8"))
+QUOTE_FIELDS = ("currentPrice", "dividendYield")
+
+cache = QuoteCache(
+    max_entries=int(os.getenv("QUOTE_CACHE_SIZE", "2048")),
+    fresh_ttl=CACHE_EXPIRY.total_seconds(),
+    stale_ttl=CACHE_STALE_WINDOW.total_seconds(),
+    negative_ttl=NEGATIVE_CACHE_EXPIRY.total_seconds(),
+    backend=get_shared_backend("quotes")
+)
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quote-refresh")
+
+# Concurrent callers for the same (ticker, fields) share one upstream fetch
+quote_flight = SingleFlight()
+
+def _quote_from_history(history):
+    """Builds the quote dict from one ticker's 1y daily history (Close and Dividends columns)."""
+    closes = history["Close"].dropna()
+    if closes.empty:
+        return None
+    current_price = float(closes.iloc[-1])
+    dividends = float(history["Dividends"].fillna(0).sum()) if "Dividends" in history else 0.0
+    return {
+        "currentPrice": round(current_price, 2),
+        "dividendYield": round((dividends / current_price) * 100, 2) if current_price else 0,
+    }
+
+def empty_quote():
+    return {
+        "currentPrice": None,
+        "dividendYield": None,
+    }
 
-def fetch_stock_data(ticker, max_retries=3):
+def is_rate_limited(error):
+    return is_throttling_error(error)
+
+def get_cached_quote(ticker):
     """
-    Fetches real-time stock data from Yahoo Finance with retry logic and caching.
-    
-    Args:
-        ticker: Stock ticker symbol
-        max_retries: Maximum number of retry attempts
+    Returns the cached quote for `ticker`, or None on a cache miss.
     
-    Returns:
-        Dictionary with current price and dividend yield
+    Stale quotes are returned immediately and refreshed in the background;
+    tickers that failed recently return an empty quote without retrying.
     """
-    current_time = datetime.now()
-    if ticker in cache and current_time - cache[ticker]["timestamp"] < CACHE_EXPIRY:
-        print(f"Using cached data for {ticker}")
-        return cache[ticker]["data"]
-        
-    retry_count = 0
-    base_delay = 2  
+    status, data = cache.lookup(ticker)
+    if status == FRESH:
+        return data
+    if status == STALE:
+        _schedule_refresh(ticker)
+        return data
+    if status == NEGATIVE:
+        return empty_quote()
+    return None
+
+def record_failure(ticker):
+    """Negative-caches `ticker` so the next requests skip the retry backoff for a short window."""
+    cache.set_failure(ticker)
+
+def _schedule_refresh(ticker):
+    if not cache.begin_refresh(ticker):
+        return
     
-    while retry_count < max_retries:
+    def refresh():
         try:
-            stock = yf.Ticker(ticker)
-            history = stock.history(period="1y")
-            
-            if history.empty:
-                raise Exception(f"No data returned for {ticker}")
-                
-            dividends = history["Dividends"].sum()
-            current_price = stock.history(period="1d")["Close"].iloc[-1]
-            
-            result = {
-                "currentPrice": round(current_price, 2),
-                "dividendYield": round((dividends / current_price) * 100, 2) if current_price else 0,
-            }
-            
-            # Store in cache
-            cache[ticker] = {
-                "data": result,
-                "timestamp": current_time
-            }
-            
-            return result
-            
+            quote_flight.do(_quote_key(ticker), _download_quote, ticker)
         except Exception as e:
-            retry_count += 1
-            if "Too Many Requests" in str(e) or "Rate limited" in str(e):
-                if retry_count >= max_retries:
-                    print(f"Error fetching data for {ticker} after {max_retries} retries: {e}")
-                    return {
-                        "currentPrice": None,
-                        "dividendYield": None,
-                    }
-                
-                delay = base_delay * (2 ** (retry_count - 1)) + random.uniform(0, 1)
-                print(f"Rate limited for {ticker}. Retrying in {delay:.2f} seconds (attempt {retry_count}/{max_retries})")
-                time.sleep(delay)
-            else:
-                print(f"Error fetching data for {ticker}: {e}")
-                return {
-                    "currentPrice": None,
-                    "dividendYield": None,
-                }
-
-def fetch_multiple_stocks(tickers, delay_between_requests=1):
+            print(f"Background refresh failed for {ticker}, keeping stale quote: {e}")
+        finally:
+            cache.end_refresh(ticker)
+    
+    _refresh_executor.submit(refresh)
+
+def _quote_key(ticker):
+    return (ticker, QUOTE_FIELDS)
+
+def _download_quote(ticker):
+    history = bar_store.get_bars(ticker, "1d", start=bar_store.period_start("1y"))
+    
+    result = _quote_from_history(history)
+    if result is None:
+        raise Exception(f"No data returned for {ticker}")
+    
+    # Store in cache
+    cache.set(ticker, result)
+    return result
+
+def fetch_live_quote(ticker, max_age=timedelta(0)):
+    """
+    Builds a quote from bars refreshed within `max_age`, bypassing the quote cache's freshness window.
+
+    Used by the live quote pollers: the stored tail (usually just today's bar)
+    is re-downloaded on every call, so the price follows the market instead of
+    the 15 minute quote cache. The result is written back to the quote cache.
     """
-    Fetches data for multiple stocks with delay between requests to avoid rate limiting.
+    bar_store.sync_bars(ticker, "1d", start=bar_store.period_start("1y"), max_age=max_age)
+    history = bar_store.read_bars(ticker, "1d", start=bar_store.period_start("1y"))
+    result = _quote_from_history(history)
+    if result is None:
+        raise Exception(f"No data returned for {ticker}")
+    cache.set(ticker, result)
+    return result
+
+def _fetch_and_cache_quote(ticker):
+    status, cached = cache.lookup(ticker, count=False)
+    if status == FRESH:
+        return cached
+    return _download_quote(ticker)
+
+def fetch_quote_once(ticker):
+    """
+    Makes a single attempt at building the quote for `ticker` and caches it.
+    
+    If another thread is already fetching the same ticker, waits for that
+    fetch and shares its outcome instead of calling Yahoo again.
+    
+    Raises:
+        Exception: When no data is available or Yahoo rejects the request.
+    """
+    result = quote_flight.do(_quote_key(ticker), _fetch_and_cache_quote, ticker)
+    if result is None:
+        # The shared flight was a bulk download that did not resolve this ticker
+        result = quote_flight.do(_quote_key(ticker), _fetch_and_cache_quote, ticker)
+        if result is None:
+            raise Exception(f"No data returned for {ticker}")
+    return result
+
+def retry_delay(retry_count, base_delay=2):
+    """Exponential backoff with jitter for the given attempt number (1-based)."""
+    return base_delay * (2 ** (retry_count - 1)) + random.uniform(0, 1)
+
+def fetch_bulk_quotes(tickers):
+    """
+    Fetches quotes for many tickers with a single multi-ticker sync of the bar store.
     
     Args:
         tickers: List of ticker symbols
-        delay_between_requests: Seconds to wait between API calls
     
     Returns:
-        Dictionary of ticker to stock data
+        Dictionary of ticker to stock data for the tickers the bulk call resolved.
+        Tickers missing from the response are left out so callers can fall back.
     """
+    if not tickers:
+        return {}
+    
+    owned, waiting = [], {}
+    for ticker in dict.fromkeys(tickers):
+        future, is_leader = quote_flight.claim(_quote_key(ticker))
+        if is_leader:
+            owned.append(ticker)
+        else:
+            waiting[ticker] = future
+    
     results = {}
+    try:
+        results.update(_bulk_quotes_for(owned))
+    finally:
+        for ticker in owned:
+            quote_flight.resolve(_quote_key(ticker), result=results.get(ticker))
+    
+    for ticker, future in waiting.items():
+        try:
+            quote = future.result()
+        except Exception:
+            continue
+        if quote is not None:
+            results[ticker] = quote
+    return results
+
+def _bulk_quotes_for(tickers):
+    if not tickers:
+        return {}
+    
+    start = bar_store.period_start("1y")
+    synced = bar_store.sync_bars_many(tickers, "1d", start=start)
     
-    for i, ticker in enumerate(tickers):
-        results[ticker] = fetch_stock_data(ticker)
-        
-        if i < len(tickers) - 1:
-            time.sleep(delay_between_requests)
-            
-    return results
\ No newline at end of file
+    # Tickers the bulk download did not refresh are left out, so callers fetch them one by one
+    results = {}
+    for ticker in tickers:
+        if ticker not in synced:
+            continue
+        try:
+            history = bar_store.read_bars(ticker, "1d", start=start)
+            if history.empty:
+                continue
+            quote = _quote_from_history(history)
+        except Exception as e:
+            print(f"Could not parse bulk data for {ticker}: {e}")
+            continue
+        if quote is None:
+            continue
+        cache.set(ticker, quote)
+        results[ticker] = quote
+    return results
@@ -1,37 +1,93 @@
+import hashlib
 import json
-import os
-import yfinance as yf
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
 
+from services import portfolio_store
+from services.bond_analytics import bond_market_values
+from services.market_data_provider import get_provider
+from services.portfolio_store import DEFAULT_USER_ID
+from services.rate_limiter import yahoo_call
+
+# Legacy single-user JSON holdings, imported into the portfolio store on first use
 STOCKS_FILE = './data/stocks.json'
 BONDS_FILE = './data/bonds.json'
 
-
-def load_stocks_data():
-    """Loads stock data from the JSON file or creates it if not present."""
-    if not os.path.exists(STOCKS_FILE):
-        os.makedirs(os.path.dirname(STOCKS_FILE), exist_ok=True)
-        save_stocks_data([])
-
-    with open(STOCKS_FILE, 'r') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
-
-
-def save_stocks_data(data):
-    """Saves stock data to the JSON file."""
-    with open(STOCKS_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+_migrated = False
+
+# Serialized /portfolio_data bodies by user: {user_id: snapshot}, see get_portfolio_snapshot
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _ensure_migrated():
+    """Imports the legacy JSON files into the portfolio store once per process."""
+    global _migrated
+    if not _migrated:
+        portfolio_store.migrate_json(STOCKS_FILE, BONDS_FILE)
+        _migrated = True
+
+
+def load_stocks_data(user_id=DEFAULT_USER_ID):
+    """Loads the user's stock holdings from the portfolio store."""
+    _ensure_migrated()
+    return portfolio_store.list_stocks(user_id)
+
+
+def save_stocks_data(data, user_id=DEFAULT_USER_ID):
+    """Saves the user's stock holdings, updating changed rows in place."""
+    _ensure_migrated()
+    portfolio_store.replace_stocks(data, user_id)
+
+
+def get_portfolio_snapshot(user_id=DEFAULT_USER_ID):
+    """
+    Returns the user's stocks and bonds serialized as JSON, cached in memory.
+
+    The cached body is reused until the store's version for the user changes,
+    which costs one indexed lookup instead of loading and serializing both
+    tables. Because the version lives in the database, writes made by other
+    workers invalidate this cache too.
+
+    Returns:
+        Dictionary with "body" (bytes), "etag", "last_modified" (HTTP date or
+        None) and "version".
+    """
+    _ensure_migrated()
+    version, updated_at = portfolio_store.portfolio_state(user_id)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(user_id)
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot
+
+    body = json.dumps({
+        "stocks": portfolio_store.list_stocks(user_id),
+        "bonds": portfolio_store.list_bonds(user_id),
+    }).encode("utf-8")
+    last_modified = None
+    if updated_at:
+        last_modified = format_datetime(datetime.fromisoformat(updated_at).astimezone(timezone.utc), usegmt=True)
+    snapshot = {
+        "version": version,
+        "body": body,
+        "etag": f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        "last_modified": last_modified,
+    }
+    with _snapshots_lock:
+        current = _snapshots.get(user_id)
+        if current is None or current["version"] <= version:
+            _snapshots[user_id] = snapshot
+    return snapshot
 
 
 def fetch_stock_data(ticker):
     """Fetches real-time stock data from Yahoo Finance."""
     try:
-        stock = yf.Ticker(ticker)
-        history = stock.history(period="1y")
+        provider = get_provider()
+        history = yahoo_call(provider.history, ticker, period="1y", auto_adjust=True)
         dividends = history["Dividends"].sum()
-        current_price = stock.history(period="1d")["Close"].iloc[-1]
+        current_price = yahoo_call(provider.history, ticker, period="1d", auto_adjust=True)["Close"].iloc[-1]
 
         return {
             "currentPrice": round(current_price, 2),
@@ -54,60 +110,34 @@ def calculate_stock_value(stock):
 
 # ------ Bonds ------- #
 
-def load_bonds_data():
-    """Loads bond data from the JSON file or returns an empty list."""
-    if os.path.exists(BONDS_FILE):
-        with open(BONDS_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return []
-    return []
+def load_bonds_data(user_id=DEFAULT_USER_ID):
+    """Loads the user's bond holdings from the portfolio store."""
+    _ensure_migrated()
+    return portfolio_store.list_bonds(user_id)
 
 
-def save_bonds_data(data):
-    """Saves bond data to the JSON file."""
-    with open(BONDS_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def save_bonds_data(data, user_id=DEFAULT_USER_ID):
+    """Saves the user's bond holdings, updating changed rows in place."""
+    _ensure_migrated()
+    portfolio_store.replace_bonds(data, user_id)
 
 def calculate_bond_value(bond):
-  """Calculates the value of a bond holding."""
-  if bond.get("principal") is not None:
-      return bond["principal"]
-  return 0
+  """Calculates the market value (dirty price) of a bond holding."""
+  return float(bond_market_values([bond])[0])
+
+def calculate_total_bond_value(bonds):
+    """Calculates the market value of all bond holdings in one vectorized pass."""
+    return float(bond_market_values(bonds).sum()) if bonds else 0.0
 
 def calculate_total_portfolio_value(stocks, bonds):
     """Calculates the total value of the portfolio."""
     stock_value = sum(calculate_stock_value(stock) for stock in stocks)
-    bond_value = sum(calculate_bond_value(bond) for bond in bonds)
-    return stock_value + bond_value
-
-
-def update_portfolio_weightages():
-    """Updates the weightageInPortfolio for all stocks and bonds."""
-    stocks = load_stocks_data()
-    bonds = load_bonds_data()
-    total_portfolio_value = calculate_total_portfolio_value(stocks, bonds)
-
-
-    if total_portfolio_value == 0:
-        for stock in stocks:
-            stock["weightageInPortfolio"] = 0
-        for bond in bonds:
-            bond["weightageInPortfolio"] = 0
-    else:
-    # Update stock weightages
-        for stock in stocks:
-          stock_value = calculate_stock_value(stock)
-          stock["weightageInPortfolio"] = round((stock_value / total_portfolio_value) * 100, 2) if stock_value else 0
-
-
-        # Update bond weightages
-        for bond in bonds:
-            bond_value = calculate_bond_value(bond)
-            bond["weightageInPortfolio"] = round((bond_value / total_portfolio_value) * 100, 2) if bond_value else 0
-
+    return stock_value + calculate_total_bond_value(bonds)
 
 
-    save_stocks_data(stocks)
-    save_bonds_data(bonds)
\ No newline at end of file
+def update_portfolio_weightages(user_id=DEFAULT_USER_ID):
+    """Updates the weightageInPortfolio for all of the user's stocks and bonds."""
+    _ensure_migrated()
+    bonds = portfolio_store.list_bonds(user_id)
+    bond_values = dict(zip((bond["id"] for bond in bonds), bond_market_values(bonds).tolist()))
+    portfolio_store.update_weightages(user_id, bond_values=bond_values)
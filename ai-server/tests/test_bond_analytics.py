@@ -0,0 +1,28 @@
+import unittest
+
+import numpy as np
+
+from services.bond_analytics import analyze_bonds, price_bonds
+
+
+class MaturedBondsTest(unittest.TestCase):
+    def test_book_of_only_matured_bonds_is_carried_at_face(self):
+        frame = analyze_bonds(
+            [{"principal": 1000, "couponRate": 5, "maturityDate": "2020-01-01", "yieldToMaturity": 4}],
+            settlement="2024-06-01",
+        )
+        self.assertTrue(frame["matured"].iloc[0])
+        self.assertEqual(frame["marketValue"].iloc[0], 1000.0)
+        self.assertEqual(frame["modifiedDuration"].iloc[0], 0.0)
+
+    def test_matured_and_live_bonds_price_together(self):
+        result = price_bonds(
+            [1000, 1000], [5, 5], ["2020-01-01", "2030-01-01"], [5, 5], settlement="2025-01-01"
+        )
+        np.testing.assert_array_equal(result["matured"], [True, False])
+        self.assertEqual(result["dirtyPrice"][0], 100.0)
+        self.assertAlmostEqual(result["cleanPrice"][1], 100.0, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()